@@ -0,0 +1,169 @@
+"""
+Benchmark the payment API endpoints against an offline Stripe stand-in.
+
+Creates a throwaway test database, serves a generated Stripe dataset through FakeStripeAdapter (see
+fake_stripe.py) with the configured latency, mirrors it locally with the sync command code, then drives
+each endpoint through the Django test client with a JWT and prints, per endpoint:
+
+- p50 / p95 / p99 latency,
+- Stripe API calls per request (and which ones),
+- database queries per request (made by the request thread, including the Stripe rate limit leases).
+
+Query counts that grow with the dataset size are the N+1 regressions to look for, run it with two
+sizes and compare. --max-queries makes the run fail when an endpoint goes over a query budget.
+
+Usage:
+    python benchmarks/endpoints.py [--products 50] [--customers 500] [--subscriptions 2000]
+                                   [--latency 0.05] [--runs 30] [--only user-subscriptions] [--max-queries 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
+
+import django
+
+django.setup()
+
+import stripe
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from fake_stripe import FakeStripeAdapter, FakeStripeData, email_for
+
+
+def endpoints(user_id):
+    """
+    (name, url) of the endpoints to benchmark, GET only so runs do not change the dataset.
+    """
+    return [
+        ("product-list", reverse("product_list")),
+        ("customer-list", reverse("customer_list")),
+        ("customer-list (local)", reverse("customer_list") + "?source=local"),
+        ("user-subscriptions", reverse("user_subscriptions")),
+        ("user-subscriptions (search)", reverse("user_subscriptions") + "?search=Product 1"),
+        ("user-subscription-information", reverse("user_subscription_information", args=[user_id])),
+        ("subscription-cancelation", reverse("subscription_cancelation")),
+        ("subscription-cancelation (fields)", reverse("subscription_cancelation") + "?fields=id,status&page_size=100"),
+        ("revenue-subscription", reverse("revenue_subscription")),
+    ]
+
+
+def install_fake_stripe(adapter):
+    from subscriptions import stripe_client
+
+    stripe_client.configure()
+    stripe.default_http_client._session.mount("https://", adapter)
+
+
+def seed(data):
+    from subscriptions import sync
+    from subscriptions.models import Users
+
+    Users.objects.bulk_create([
+        Users(email=email_for(index), first_name=f"Customer {index}", role="User", state=["CA", "NY", "TX"][index % 3])
+        for index in range(len(data.customers))
+    ])
+    sync.sync_all()
+
+    return Users.objects.order_by("id").first()
+
+
+def percentile(timings, percent):
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method="inclusive")[percent - 1]
+
+
+def run(client, adapter, url, runs):
+    client.get(url)  # warm up: catalog fill, customer cache, connections
+
+    timings, stripe_calls, queries, calls = [], [], [], None
+    for _ in range(runs):
+        adapter.reset_calls()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+        stripe_calls.append(sum(adapter.calls.values()))
+        queries.append(len(captured))
+        calls = dict(adapter.calls)
+
+    return {
+        "status": response.status_code,
+        "p50": percentile(timings, 50),
+        "p95": percentile(timings, 95),
+        "p99": percentile(timings, 99),
+        "stripe_calls": statistics.median(stripe_calls),
+        "queries": statistics.median(queries),
+        "calls": calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--subscriptions", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every Stripe call")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--only", help="Only run the endpoints whose name contains this text")
+    parser.add_argument("--max-queries", type=int, help="Exit with an error when an endpoint needs more queries")
+    parser.add_argument("--verbose", action="store_true", help="Also print the Stripe calls of every endpoint")
+    args = parser.parse_args()
+
+    data = FakeStripeData(args.products, args.customers, args.subscriptions)
+    adapter = FakeStripeAdapter(data, latency=0)
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        # The whole run is one process, the shared rate limit must not be what gets measured
+        with override_settings(STRIPE_RATE_LIMIT=1e6, STRIPE_RATE_LIMIT_BURST=1e6, DEBUG=False):
+            install_fake_stripe(adapter)
+            user = seed(data)
+            adapter.latency = args.latency
+
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+            print(
+                f"{args.products} products, {args.customers} customers, {args.subscriptions} subscriptions, "
+                f"{args.latency * 1000:.0f} ms Stripe latency, {args.runs} runs\n"
+            )
+            print(f"{'endpoint':36} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'stripe':>7} {'queries':>8}")
+
+            over_budget = []
+            for name, url in endpoints(user.id):
+                if args.only and args.only not in name:
+                    continue
+
+                result = run(client, adapter, url, args.runs)
+                print(
+                    f"{name:36} {result['status']:>6} {result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} "
+                    f"{result['p99'] * 1000:>9.1f} {result['stripe_calls']:>7g} {result['queries']:>8g}"
+                )
+                if args.verbose:
+                    for call, count in sorted(result["calls"].items()):
+                        print(f"    {count:>4} x {call}")
+
+                if args.max_queries is not None and result["queries"] > args.max_queries:
+                    over_budget.append(name)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    if over_budget:
+        print(f"\nOver the {args.max_queries} queries budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Offline stand-in for the Stripe API, used by the endpoint benchmarks.
+
+FakeStripeAdapter is a requests transport adapter serving a generated dataset of products, prices,
+customers and subscriptions. It is mounted on the session of the pooled Stripe client, so requests go
+through the real client stack (throttling, retries, counters) and only the network is replaced.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+BASE_TIMESTAMP = 1700000000
+SERVICES = ["consulting", "hosting", "support", "training"]
+
+
+class FakeStripeData:
+    """
+    Deterministic Stripe dataset with `products` products (one monthly price each), `customers`
+    customers and `subscriptions` subscriptions spread over them.
+    """
+
+    def __init__(self, products, customers, subscriptions):
+        self.prices = {}
+        self.products = {}
+        for index in range(products):
+            price_id = f"price_{index:06d}"
+            product_id = f"prod_{index:06d}"
+            self.prices[price_id] = {
+                "id": price_id,
+                "object": "price",
+                "active": True,
+                "billing_scheme": "per_unit",
+                "created": BASE_TIMESTAMP,
+                "currency": "usd",
+                "livemode": False,
+                "product": product_id,
+                "recurring": {"interval": "month", "interval_count": 1, "usage_type": "licensed"},
+                "tax_behavior": "unspecified",
+                "type": "recurring",
+                "unit_amount": 1000 + index,
+                "unit_amount_decimal": str(1000 + index),
+            }
+            self.products[product_id] = {
+                "id": product_id,
+                "object": "product",
+                "active": True,
+                "name": f"Product {index}",
+                "description": f"Benchmark product {index}",
+                "metadata": {"service": SERVICES[index % len(SERVICES)]},
+                "default_price": price_id,
+                "type": "service",
+                "created": BASE_TIMESTAMP,
+            }
+
+        self.customers = {
+            f"cus_{index:06d}": {
+                "id": f"cus_{index:06d}",
+                "object": "customer",
+                "email": email_for(index),
+                "name": f"Customer {index}",
+                "created": BASE_TIMESTAMP + index,
+            }
+            for index in range(customers)
+        }
+
+        self.subscriptions = {}
+        price_ids = list(self.prices)
+        customer_ids = list(self.customers)
+        for index in range(subscriptions):
+            subscription_id = f"sub_{index:06d}"
+            price = self.prices[price_ids[index % len(price_ids)]]
+            plan = {key: price[key] for key in ("id", "active", "billing_scheme", "created", "currency", "livemode", "product")}
+            plan.update(object="plan", interval="month", interval_count=1, usage_type="licensed")
+            self.subscriptions[subscription_id] = {
+                "id": subscription_id,
+                "object": "subscription",
+                "billing_cycle_anchor": BASE_TIMESTAMP + index,
+                "cancel_at_period_end": False,
+                "canceled_at": None,
+                "collection_method": "charge_automatically",
+                "created": BASE_TIMESTAMP + index,
+                "currency": "usd",
+                "current_period_end": BASE_TIMESTAMP + index + 30 * 86400,
+                "current_period_start": BASE_TIMESTAMP + index,
+                "customer": customer_ids[index % len(customer_ids)],
+                "default_payment_method": None,
+                "items": {
+                    "object": "list",
+                    "data": [{
+                        "id": f"si_{index:06d}",
+                        "object": "subscription_item",
+                        "created": BASE_TIMESTAMP + index,
+                        "plan": plan,
+                        "price": price,
+                        "quantity": 1,
+                        "subscription": subscription_id,
+                    }],
+                    "has_more": False,
+                    "total_count": 1,
+                    "url": f"/v1/subscription_items?subscription={subscription_id}",
+                },
+                "plan": plan,
+                "quantity": 1,
+                "start_date": BASE_TIMESTAMP + index,
+                "status": "active",
+                "trial_end": None,
+                "trial_settings": {"end_behavior": {"missing_payment_method": "create_invoice"}},
+            }
+
+
+def email_for(index):
+    return f"customer{index}@bench.local"
+
+
+class FakeStripeAdapter(BaseAdapter):
+    """
+    requests adapter answering the Stripe API calls made by the views from a FakeStripeData.
+
+    Every call sleeps `latency` seconds and is counted by method and path (IDs replaced by {id}).
+    """
+
+    def __init__(self, data, latency=0.0):
+        super().__init__()
+        self.data = data
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        body = request.body.decode() if isinstance(request.body, bytes) else request.body or ""
+        params = parse_qsl(url.query) + parse_qsl(body)
+        parts = url.path.strip("/").split("/")[1:]  # drop the API version
+        resource, object_id = parts[0], (parts[1] if len(parts) > 1 else None)
+
+        with self._lock:
+            self.calls[f"{request.method} /v1/{resource}" + ("/{id}" if object_id else "")] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if request.method == "DELETE" and resource == "subscriptions":
+            status, body = self._retrieve(resource, object_id)
+            if status == 200:
+                body = dict(body, status="canceled")
+        elif object_id:
+            status, body = self._retrieve(resource, object_id)
+        else:
+            status, body = self._list(resource, params, url.path)
+
+        return self._response(request, status, body)
+
+    def _retrieve(self, resource, object_id):
+        objects = self._objects(resource)
+        if objects is None or object_id not in objects:
+            return 404, {"error": {"type": "invalid_request_error", "message": f"No such {resource[:-1]}: '{object_id}'"}}
+        return 200, objects[object_id]
+
+    def _list(self, resource, params, path):
+        objects = self._objects(resource)
+        if objects is None:
+            return 404, {"error": {"type": "invalid_request_error", "message": f"Unrecognized request URL ({path})"}}
+
+        filters = {}
+        ids = []
+        expand = []
+        for key, value in params:
+            if key.startswith("ids["):
+                ids.append(value)
+            elif key.startswith("expand["):
+                expand.append(value)
+            else:
+                filters[key] = value
+
+        rows = [objects[object_id] for object_id in ids if object_id in objects] if ids else list(objects.values())
+
+        if "email" in filters:
+            rows = [row for row in rows if row.get("email") == filters["email"]]
+        if "customer" in filters:
+            rows = [row for row in rows if row.get("customer") == filters["customer"]]
+        if "product" in filters:
+            rows = [row for row in rows if row.get("product") == filters["product"]]
+        if "price" in filters:
+            rows = [row for row in rows if any(item["price"]["id"] == filters["price"] for item in row["items"]["data"])]
+        if resource == "subscriptions" and filters.get("status", "active") != "all":
+            rows = [row for row in rows if row["status"] != "canceled"]
+
+        if "starting_after" in filters:
+            position = next((index for index, row in enumerate(rows) if row["id"] == filters["starting_after"]), None)
+            if position is None:
+                return 400, {"error": {"type": "invalid_request_error", "message": "Invalid starting_after"}}
+            rows = rows[position + 1:]
+
+        limit = int(filters.get("limit", 10))
+        page = rows[:limit]
+
+        if "data.default_price" in expand:
+            page = [dict(row, default_price=self.data.prices.get(row["default_price"])) for row in page]
+
+        return 200, {"object": "list", "data": page, "has_more": len(rows) > limit, "url": path}
+
+    def _objects(self, resource):
+        return {
+            "products": self.data.products,
+            "prices": self.data.prices,
+            "customers": self.data.customers,
+            "subscriptions": self.data.subscriptions,
+        }.get(resource)
+
+    def _response(self, request, status, body):
+        response = Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json", "Request-Id": "req_bench"})
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
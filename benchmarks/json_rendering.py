@@ -0,0 +1,97 @@
+"""
+Benchmark DRF's JSONRenderer against the orjson-backed ORJSONRenderer on large listing payloads.
+
+Builds a success_response envelope holding 10k product/subscription-like items (Stripe objects,
+Decimals and datetimes, like the listing APIs return), renders it with both renderers and prints
+the median render time and payload size.
+
+Usage:
+    python benchmarks/json_rendering.py [--items 10000] [--runs 20]
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from django.conf import settings
+
+# Rendering needs no database, only DRF's settings
+settings.configure(
+    INSTALLED_APPS=["django.contrib.contenttypes", "django.contrib.auth", "rest_framework"],
+    USE_TZ=True,
+)
+
+import django
+
+django.setup()
+
+import stripe
+from rest_framework.renderers import JSONRenderer
+from server.renderers import ORJSONRenderer
+
+
+def build_payload(items):
+    now = datetime.now(timezone.utc)
+    data = [
+        stripe.StripeObject.construct_from({
+            "id": f"sub_{index:08d}",
+            "object": "subscription",
+            "customer": f"cus_{index % 997:08d}",
+            "status": "active",
+            "created": 1700000000 + index,
+            "items": {
+                "object": "list",
+                "data": [{
+                    "id": f"si_{index:08d}",
+                    "quantity": 1,
+                    "price": {
+                        "id": f"price_{index % 50:04d}",
+                        "currency": "usd",
+                        "unit_amount": 1999,
+                        "recurring": {"interval": "month", "interval_count": 1},
+                    },
+                }],
+            },
+        }, None)
+        for index in range(items)
+    ]
+    rows = [
+        {"product_name": f"Product {index}", "total_revenue": Decimal("1999.99"), "synced_at": now}
+        for index in range(items)
+    ]
+
+    return {"message": "Subscriptions Found", "data": {"subscriptions": data, "revenue": rows}, "status": 200}
+
+
+def measure(renderer, payload, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = renderer.render(payload, "application/json", {})
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = build_payload(args.items)
+
+    baseline, baseline_size = measure(JSONRenderer(), payload, args.runs)
+    fast, fast_size = measure(ORJSONRenderer(), payload, args.runs)
+
+    print(f"{args.items} items, median of {args.runs} runs")
+    print(f"  JSONRenderer    {baseline * 1000:8.1f} ms  {baseline_size:>10} bytes")
+    print(f"  ORJSONRenderer  {fast * 1000:8.1f} ms  {fast_size:>10} bytes  ({baseline / fast:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
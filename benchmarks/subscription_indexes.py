@@ -0,0 +1,150 @@
+"""
+Benchmark the Subscription indexes against the hot queries they are meant to serve.
+
+Seeds a scratch copy of the subscription table (1M rows by default) in the configured PostgreSQL
+database, runs each query with and without the indexes declared in `Subscription.Meta`, and prints
+the query plans and median timings.
+
+Usage:
+    python benchmarks/subscription_indexes.py [--rows 1000000] [--runs 5] [--keep]
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
+
+import django
+
+django.setup()
+
+from django.db import connection
+
+
+TABLE = "bench_subscription"
+
+# Same definitions as Subscription.Meta, on the scratch table
+INDEXES = [
+    f"CREATE UNIQUE INDEX bench_unique_subscription ON {TABLE} "
+    f"(stripe_subscription_id, community_id, user_id, product_id)",
+    f"CREATE INDEX bench_active_trial_idx ON {TABLE} (user_id, community_id, trial_end_date) "
+    f"WHERE payment_status = 'paid' AND trial_end_date IS NOT NULL",
+    f"CREATE INDEX bench_status_idx ON {TABLE} (payment_status, id DESC)",
+]
+
+
+def seed(cursor, rows, users, communities):
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {TABLE} (
+            id bigserial PRIMARY KEY,
+            product_id varchar(255) NOT NULL,
+            user_id bigint NOT NULL,
+            community_id uuid NOT NULL,
+            stripe_subscription_id varchar(255),
+            trial_end_date timestamptz,
+            payment_amount numeric(10, 2) NOT NULL,
+            payment_status varchar(50) NOT NULL,
+            created_date timestamptz NOT NULL DEFAULT now(),
+            modified_date timestamptz NOT NULL DEFAULT now(),
+            is_active boolean NOT NULL DEFAULT true
+        )
+    """)
+    # The FK indexes Django creates for Subscription.user and Subscription.community
+    cursor.execute(f"CREATE INDEX bench_user_idx ON {TABLE} (user_id)")
+    cursor.execute(f"CREATE INDEX bench_community_idx ON {TABLE} (community_id)")
+    cursor.execute(f"""
+        INSERT INTO {TABLE} (product_id, user_id, community_id, stripe_subscription_id,
+                             trial_end_date, payment_amount, payment_status)
+        SELECT
+            'prod_' || (g %% 50),
+            g %% %(users)s,
+            md5('community' || (g %% %(communities)s))::uuid,
+            'sub_' || (g / 3),
+            CASE WHEN g %% 4 = 0 THEN now() + ((g %% 60) - 30) * interval '1 day' END,
+            (g %% 100) + 0.99,
+            (ARRAY['paid', 'active', 'canceled'])[g %% 3 + 1]
+        FROM generate_series(1, %(rows)s) AS g
+    """, {"rows": rows, "users": users, "communities": communities})
+    cursor.execute(f"ANALYZE {TABLE}")
+
+
+def queries(users):
+    # The common case of the free trial check: the user has no active trial in the requested communities
+    user_id = users // 2
+    community_ids = [str(uuid.UUID(hex=hashlib.md5(f"community{n}".encode()).hexdigest())) for n in range(3)]
+
+    return {
+        "free trial check (FreeTrialSubscription)": (
+            f"SELECT 1 FROM {TABLE} WHERE user_id = %s AND payment_status = 'paid' "
+            f"AND community_id = ANY(%s::uuid[]) AND trial_end_date > now() LIMIT 1",
+            [user_id, community_ids],
+        ),
+        "lookup by stripe_subscription_id (webhook/sync)": (
+            f"SELECT id FROM {TABLE} WHERE stripe_subscription_id = %s",
+            ["sub_12345"],
+        ),
+        "admin payment_status filter": (
+            f"SELECT id FROM {TABLE} WHERE payment_status = %s ORDER BY id DESC LIMIT 100",
+            ["canceled"],
+        ),
+    }
+
+
+def measure(cursor, sql, params, runs):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+    plan = "\n".join(row[0] for row in cursor.fetchall())
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return plan, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--communities", type=int, default=2_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch table afterwards")
+    args = parser.parse_args()
+
+    with connection.cursor() as cursor:
+        print(f"Seeding {args.rows} rows into {TABLE}...")
+        seed(cursor, args.rows, args.users, args.communities)
+
+        results = {}
+        for label in ("before", "after"):
+            if label == "after":
+                for statement in INDEXES:
+                    cursor.execute(statement)
+                cursor.execute(f"ANALYZE {TABLE}")
+
+            for name, (sql, params) in queries(args.users).items():
+                plan, median_ms = measure(cursor, sql, params, args.runs)
+                results.setdefault(name, {})[label] = median_ms
+                print(f"\n=== {name} [{label} indexes] median {median_ms:.2f} ms\n{plan}")
+
+        print("\nSummary (median ms)")
+        print(f"{'query':<50} {'before':>10} {'after':>10} {'speedup':>8}")
+        for name, timing in results.items():
+            speedup = timing["before"] / timing["after"] if timing["after"] else float("inf")
+            print(f"{name:<50} {timing['before']:>10.2f} {timing['after']:>10.2f} {speedup:>7.1f}x")
+
+        if not args.keep:
+            cursor.execute(f"DROP TABLE {TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -38,4 +38,16 @@ MESSAGES = {
     "FREE_TRIAL_SUBSCRIPTION_SESSION_CREATED": "Free Transactions Session Created",
     "SUBSCRIPTIONS_FOUND": "Subscriptions Found",
     "REVENUE_CALCULATED": "Revenue Fetched",
+    "WEBHOOK_STATS_FETCHED": "Webhook Stats Fetched",
+    "STRIPE_METRICS_FETCHED": "Stripe Client Metrics Fetched",
+    "INVALID_EXPORT_FORMAT": "Invalid Export Format",
+    "PRICE_MIGRATION_STARTED": "Subscription price migration started",
+    "PRICE_MIGRATION_NOT_FOUND": "Price migration not found",
+    "PRICE_MIGRATION_FETCHED": "Price migration fetched",
+    "INVALID_FIELDS": "Invalid Fields Selection",
+    "REQUEST_METRICS_FETCHED": "Request Metrics Fetched",
+    "ANALYTICS_FETCHED": "Analytics Fetched",
+    "INVALID_CURSOR": "Invalid Cursor",
+    "INVALID_PAGE": "Invalid Page",
+    "STRIPE_UNAVAILABLE": "Stripe is temporarily unavailable",
 }
\ No newline at end of file
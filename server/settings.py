@@ -40,13 +40,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
-    "subscription",
+    "subscriptions",
     'rest_framework',
     'rest_framework_simplejwt',
 ]
 
 MIDDLEWARE = [
+    'subscriptions.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -77,6 +79,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'server.wsgi.application'
 
+# The async views under /payment/async/ are served by the ASGI entry point
+ASGI_APPLICATION = 'server.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -116,6 +121,12 @@ REST_FRAMEWORK = {
             'rest_framework_simplejwt.authentication.JWTAuthentication',
         ),
 
+        # orjson-backed JSON rendering, falls back to DRF's JSONRenderer when orjson is not installed
+        'DEFAULT_RENDERER_CLASSES': (
+            'server.renderers.ORJSONRenderer',
+            'rest_framework.renderers.BrowsableAPIRenderer',
+        ),
+
         # 'DEFAULT_PERMISSION_CLASSES': (
         #     'rest_framework.permissions.IsAuthenticated',  # Require authentication by default
         # ),
@@ -172,4 +183,80 @@ STRIPE_PUBLIC_KEY = config("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY")
 WEBHOOK_SECRET = config("STRIPE_WEBHOOK")
 
-X_FRAME_OPTIONS = 'SAMEORIGIN'
\ No newline at end of file
+X_FRAME_OPTIONS = 'SAMEORIGIN'
+
+# Local product/price catalog served by the product list API
+STRIPE_CATALOG_TTL = config("STRIPE_CATALOG_TTL", default=300, cast=int)  # seconds
+STRIPE_CATALOG_MAX_SIZE = config("STRIPE_CATALOG_MAX_SIZE", default=1000, cast=int)
+
+# Asynchronous Stripe webhook processing
+STRIPE_WEBHOOK_WORKERS = config("STRIPE_WEBHOOK_WORKERS", default=4, cast=int)
+STRIPE_WEBHOOK_MAX_ATTEMPTS = config("STRIPE_WEBHOOK_MAX_ATTEMPTS", default=5, cast=int)
+STRIPE_WEBHOOK_LEASE = config("STRIPE_WEBHOOK_LEASE", default=300, cast=int)  # seconds
+STRIPE_WEBHOOK_RETRY_DELAY = config("STRIPE_WEBHOOK_RETRY_DELAY", default=10, cast=int)  # seconds, doubled per attempt
+STRIPE_WEBHOOK_DEDUP_RETENTION = config("STRIPE_WEBHOOK_DEDUP_RETENTION", default=30, cast=int)  # days
+
+# Concurrent Stripe fetches (per-item Product.retrieve...)
+STRIPE_FETCH_MAX_WORKERS = config("STRIPE_FETCH_MAX_WORKERS", default=8, cast=int)
+
+# Pooled HTTP client used for every Stripe call
+STRIPE_HTTP_POOL_CONNECTIONS = config("STRIPE_HTTP_POOL_CONNECTIONS", default=4, cast=int)
+STRIPE_HTTP_POOL_SIZE = config("STRIPE_HTTP_POOL_SIZE", default=20, cast=int)
+STRIPE_HTTP_CONNECT_TIMEOUT = config("STRIPE_HTTP_CONNECT_TIMEOUT", default=5, cast=float)  # seconds
+STRIPE_HTTP_TIMEOUT = config("STRIPE_HTTP_TIMEOUT", default=30, cast=float)  # seconds
+
+# Background subscription price migrations
+PRICE_MIGRATION_STALE_AFTER = config("PRICE_MIGRATION_STALE_AFTER", default=300, cast=int)  # seconds
+PRICE_MIGRATION_WORKERS = config("PRICE_MIGRATION_WORKERS", default=2, cast=int)
+
+# Stripe rate limiting (shared by all worker processes)
+STRIPE_RATE_LIMIT = config("STRIPE_RATE_LIMIT", default=25, cast=float)  # requests per second
+STRIPE_RATE_LIMIT_BURST = config("STRIPE_RATE_LIMIT_BURST", default=25, cast=float)
+STRIPE_RATE_LIMIT_LEASE = config("STRIPE_RATE_LIMIT_LEASE", default=5, cast=int)  # tokens taken per database round trip
+STRIPE_RATE_LIMIT_MAX_RETRIES = config("STRIPE_RATE_LIMIT_MAX_RETRIES", default=4, cast=int)
+
+# Users -> Stripe customer ID resolution cache (per process)
+STRIPE_CUSTOMER_CACHE_SIZE = config("STRIPE_CUSTOMER_CACHE_SIZE", default=10000, cast=int)
+STRIPE_CUSTOMER_CACHE_TTL = config("STRIPE_CUSTOMER_CACHE_TTL", default=3600, cast=int)  # seconds
+
+# Subscription analytics (seconds the loaded subscription items are reused between requests)
+ANALYTICS_CACHE_TTL = config("ANALYTICS_CACHE_TTL", default=60, cast=int)
+
+# Stripe circuit breaker (per process): opens on the error or slow call rate of the last window
+STRIPE_BREAKER_WINDOW = config("STRIPE_BREAKER_WINDOW", default=30, cast=int)  # seconds
+STRIPE_BREAKER_MIN_CALLS = config("STRIPE_BREAKER_MIN_CALLS", default=10, cast=int)
+STRIPE_BREAKER_ERROR_RATE = config("STRIPE_BREAKER_ERROR_RATE", default=0.5, cast=float)
+STRIPE_BREAKER_SLOW_CALL = config("STRIPE_BREAKER_SLOW_CALL", default=5, cast=float)  # seconds
+STRIPE_BREAKER_SLOW_RATE = config("STRIPE_BREAKER_SLOW_RATE", default=0.5, cast=float)
+STRIPE_BREAKER_OPEN_SECONDS = config("STRIPE_BREAKER_OPEN_SECONDS", default=30, cast=int)
+
+# Last good Stripe reads, served stale while Stripe is unavailable (per process)
+STRIPE_READ_TIMEOUT = config("STRIPE_READ_TIMEOUT", default=5, cast=float)  # seconds, when a stale result exists
+STRIPE_STALE_CACHE_SIZE = config("STRIPE_STALE_CACHE_SIZE", default=10000, cast=int)
+STRIPE_STALE_MAX_AGE = config("STRIPE_STALE_MAX_AGE", default=86400, cast=int)  # seconds
+
+# Logging: one JSON line per request from the instrumentation middleware, warnings of the Stripe integration
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        # The instrumentation messages are already JSON documents
+        "message": {"format": "%(message)s"},
+        "verbose": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "verbose"},
+        "request_metrics": {"class": "logging.StreamHandler", "formatter": "message"},
+    },
+    "loggers": {
+        "subscriptions": {
+            "handlers": ["console"],
+            "level": config("SUBSCRIPTIONS_LOG_LEVEL", default="WARNING"),
+        },
+        "subscriptions.instrumentation": {
+            "handlers": ["request_metrics"],
+            "level": config("INSTRUMENTATION_LOG_LEVEL", default="INFO"),
+            "propagate": False,
+        },
+    },
+}
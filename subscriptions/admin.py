@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Subscription
+from .models import Subscription, StripeProduct, StripeCustomer, StripeSubscriptionItem, WebhookEvent, PriceMigrationJob
 
 # Register your models here.
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -7,4 +7,39 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_filter = ('payment_status', 'community', 'user')
     search_fields = ('stripe_subscription_id', 'community__name', 'user__email')
     
+
+class StripeProductAdmin(admin.ModelAdmin):
+    list_display = ('product_id', 'name', 'default_price_id', 'unit_amount', 'currency', 'is_active', 'synced_at')
+    list_filter = ('is_active', 'currency')
+    search_fields = ('product_id', 'name')
+
+
+class StripeCustomerAdmin(admin.ModelAdmin):
+    list_display = ('customer_id', 'email', 'name', 'user', 'created')
+    search_fields = ('customer_id', 'email', 'name')
+
+
+class StripeSubscriptionItemAdmin(admin.ModelAdmin):
+    list_display = ('item_id', 'subscription_id', 'customer', 'product_name', 'unit_amount', 'currency', 'status', 'created')
+    list_filter = ('status', 'currency')
+    search_fields = ('subscription_id', 'product_id', 'product_name', 'customer__email')
+
+
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'status', 'attempts', 'received_date', 'processed_date')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id',)
+
+
+class PriceMigrationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product_id', 'new_price_id', 'status', 'processed_count', 'updated_count', 'started_date', 'finished_date')
+    list_filter = ('status',)
+    search_fields = ('product_id', 'new_price_id')
+
+
 admin.site.register(Subscription, SubscriptionAdmin)
+admin.site.register(StripeProduct, StripeProductAdmin)
+admin.site.register(StripeCustomer, StripeCustomerAdmin)
+admin.site.register(StripeSubscriptionItem, StripeSubscriptionItemAdmin)
+admin.site.register(WebhookEvent, WebhookEventAdmin)
+admin.site.register(PriceMigrationJob, PriceMigrationJobAdmin)
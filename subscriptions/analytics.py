@@ -0,0 +1,252 @@
+import threading
+import time
+import pandas as pd
+from django.conf import settings
+from .models import StripeSubscriptionItem
+
+# Columns loaded from the subscription item mirror, in one columnar query
+ITEM_COLUMNS = [
+    "subscription_id", "customer_id", "product_id", "product_name", "status", "unit_amount", "currency",
+    "quantity", "interval", "created", "trial_end", "canceled_at", "ended_at",
+]
+DATE_COLUMNS = ["created", "trial_end", "canceled_at", "ended_at"]
+
+# Subscriptions whose first payment never went through, they never produced revenue
+NEVER_PAID_STATUSES = ("incomplete", "incomplete_expired")
+
+# Price interval -> factor turning one period's amount into a monthly amount
+MONTHLY_FACTORS = {"day": 365.25 / 12, "week": 365.25 / 12 / 7, "month": 1, "year": 1 / 12}
+
+_frame = None
+_loaded_at = 0.0
+_frame_lock = threading.Lock()
+
+
+def load_items():
+    """
+    Return the mirrored subscription items as a DataFrame, reloaded at most every ANALYTICS_CACHE_TTL seconds.
+
+    Derived columns:
+    - monthly_amount: Recurring amount normalized to a month, in cents.
+    - billing_start: When the item started paying (the end of its trial, if any).
+    - ended_at: When the subscription stopped paying. Subscriptions canceled at period end keep paying
+      until then, and canceled rows mirrored without ended_at fall back to canceled_at.
+    - start_month / end_month: Monthly periods of billing_start and ended_at.
+    """
+    global _frame, _loaded_at
+
+    with _frame_lock:
+        if _frame is None or time.monotonic() - _loaded_at > settings.ANALYTICS_CACHE_TTL:
+            _frame = _build_frame()
+            _loaded_at = time.monotonic()
+        return _frame
+
+
+def mrr(months=12):
+    """
+    Monthly recurring revenue per currency: the current MRR, its split by product and its month-end history.
+
+    Returns:
+    - list: One dict per currency, amounts in currency units.
+    """
+    frame = _paying(load_items())
+    now = _now()
+    month_index = pd.period_range(end=now.to_period("M"), periods=months, freq="M")
+
+    result = []
+    for currency, items in frame.groupby("currency"):
+        gained = items.groupby("start_month")["monthly_amount"].sum()
+        lost = items.dropna(subset=["end_month"]).groupby("end_month")["monthly_amount"].sum()
+        history = _running_total(gained.sub(lost, fill_value=0), month_index)
+
+        active = items[(items["billing_start"] <= now) & (items["ended_at"].isna() | (items["ended_at"] > now))]
+        by_product = (
+            active.groupby(["product_id", "product_name"], dropna=False)["monthly_amount"].sum()
+            .sort_values(ascending=False)
+        )
+
+        result.append({
+            "currency": currency,
+            "mrr": round(float(active["monthly_amount"].sum()) / 100, 2),
+            "by_product": [
+                {"product_id": product_id, "product_name": None if pd.isna(name) else name, "mrr": round(float(amount) / 100, 2)}
+                for (product_id, name), amount in by_product.items()
+            ],
+            "history": [
+                {"month": str(month), "mrr": round(float(amount) / 100, 2)}
+                for month, amount in history.items()
+            ],
+        })
+
+    return result
+
+
+def churn(months=12):
+    """
+    Monthly subscription churn: subscriptions active at the start of each month, started and canceled in it.
+
+    Returns:
+    - list: One dict per month, oldest first.
+    """
+    subscriptions = _subscriptions(_paying(load_items()))
+    month_index = pd.period_range(end=_now().to_period("M"), periods=months, freq="M")
+
+    started = subscriptions.groupby("start_month").size()
+    churned = subscriptions.dropna(subset=["end_month"]).groupby("end_month").size()
+    active_at_end = _running_total(started.sub(churned, fill_value=0), month_index, include_previous=True)
+    active_at_start = active_at_end.shift(1).iloc[1:]
+
+    started = started.reindex(month_index, fill_value=0)
+    churned = churned.reindex(month_index, fill_value=0)
+
+    return [
+        {
+            "month": str(month),
+            "active_at_start": int(active_at_start[month]),
+            "started": int(started[month]),
+            "churned": int(churned[month]),
+            "churn_rate": round(float(churned[month] / active_at_start[month]), 4) if active_at_start[month] else None,
+        }
+        for month in month_index
+    ]
+
+
+def trial_conversion(months=12):
+    """
+    Trials ended per month and how many of them turned into paying subscriptions.
+
+    Returns:
+    - list: One dict per month, oldest first.
+    """
+    items = load_items()
+    now = _now()
+    month_index = pd.period_range(end=now.to_period("M"), periods=months, freq="M")
+
+    trials = items.groupby("subscription_id").agg(trial_end=("trial_end", "max"), ended_at=("ended_at", "max"))
+    trials = trials[trials["trial_end"].notna() & (trials["trial_end"] <= now)]
+    trials = trials.assign(
+        month=trials["trial_end"].dt.to_period("M"),
+        converted=trials["ended_at"].isna() | (trials["ended_at"] > trials["trial_end"]),
+    )
+
+    table = trials.groupby("month")["converted"].agg(["size", "sum"]).reindex(month_index, fill_value=0)
+
+    return [
+        {
+            "month": str(month),
+            "trials_ended": int(row["size"]),
+            "converted": int(row["sum"]),
+            "conversion_rate": round(float(row["sum"] / row["size"]), 4) if row["size"] else None,
+        }
+        for month, row in table.iterrows()
+    ]
+
+
+def cohorts(months=12):
+    """
+    Monthly customer cohorts: customers grouped by the month they started paying, and the share of each
+    cohort still paying 0, 1, 2... months later. Offsets not reached yet are None.
+
+    Returns:
+    - list: One dict per cohort of the last `months` months, oldest first.
+    """
+    subscriptions = _subscriptions(_paying(load_items()))
+    current = _now().to_period("M")
+    now_month = current.year * 12 + current.month
+
+    customers = subscriptions.assign(active=subscriptions["end_month"].isna()).groupby("customer_id").agg(
+        start_month=("start_month", "min"),
+        last_cancel=("end_month", "max"),
+        any_active=("active", "any"),
+    )
+    cohort = _month_number(customers["start_month"])
+    customers = customers.assign(
+        cohort=cohort,
+        # Months the customer kept paying; still-paying customers outlive every offset shown
+        lifetime=(
+            (_month_number(customers["last_cancel"]) - cohort)
+            .where(~customers["any_active"].astype(bool), months + 1)
+            .clip(upper=months + 1)
+            .astype(int)
+        ),
+    )
+    customers = customers[customers["cohort"] > now_month - months]
+    if customers.empty:
+        return []
+
+    counts = customers.groupby(["cohort", "lifetime"]).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=range(0, months + 2), fill_value=0)
+    # still_paying[k] = customers whose lifetime is greater than k
+    still_paying = counts.iloc[:, ::-1].cumsum(axis=1).iloc[:, ::-1].shift(-1, axis=1, fill_value=0)
+    sizes = counts.sum(axis=1)
+
+    return [
+        {
+            "cohort": str(pd.Period(year=(cohort - 1) // 12, month=(cohort - 1) % 12 + 1, freq="M")),
+            "customers": int(sizes[cohort]),
+            "retention": [
+                round(float(still_paying.at[cohort, offset] / sizes[cohort]), 4) if offset <= now_month - cohort else None
+                for offset in range(months)
+            ],
+        }
+        for cohort in sorted(counts.index)
+    ]
+
+
+def _build_frame():
+    rows = StripeSubscriptionItem.objects.values_list(*ITEM_COLUMNS)
+    frame = pd.DataFrame.from_records(list(rows), columns=ITEM_COLUMNS)
+
+    for column in DATE_COLUMNS:
+        frame[column] = pd.to_datetime(frame[column], utc=True).dt.tz_localize(None)
+
+    frame = frame[~frame["status"].isin(NEVER_PAID_STATUSES)]
+    # One-off prices have no interval and no recurring revenue
+    frame = frame.assign(
+        monthly_amount=frame["unit_amount"].fillna(0) * frame["quantity"] * frame["interval"].map(MONTHLY_FACTORS).fillna(0),
+        billing_start=frame["trial_end"].where(frame["trial_end"] > frame["created"], frame["created"]),
+        ended_at=frame["ended_at"].fillna(frame["canceled_at"].where(frame["status"] == "canceled")),
+    )
+    return frame.assign(
+        start_month=frame["billing_start"].dt.to_period("M"),
+        end_month=frame["ended_at"].dt.to_period("M"),
+    )
+
+
+def _paying(items):
+    """
+    Items that paid at least once (not canceled before their trial ended).
+    """
+    return items[items["ended_at"].isna() | (items["ended_at"] > items["billing_start"])]
+
+
+def _subscriptions(items):
+    """
+    One row per subscription, from its items.
+    """
+    return items.groupby("subscription_id").agg(
+        customer_id=("customer_id", "first"),
+        start_month=("start_month", "min"),
+        end_month=("end_month", "max"),
+    )
+
+
+def _running_total(changes, month_index, include_previous=False):
+    """
+    Cumulative sum of monthly changes, read at each month of `month_index` (and the month before it).
+    """
+    first_month = month_index[0] - 1
+    if len(changes):
+        first_month = min(first_month, changes.index.min())
+    full_index = pd.period_range(start=first_month, end=month_index[-1], freq="M")
+
+    totals = changes.reindex(full_index, fill_value=0).cumsum()
+    return totals.reindex(month_index.insert(0, month_index[0] - 1) if include_previous else month_index)
+
+
+def _month_number(periods):
+    return periods.dt.year * 12 + periods.dt.month
+
+
+def _now():
+    return pd.Timestamp.now(tz="UTC").tz_localize(None)
@@ -0,0 +1,267 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+import stripe
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from server import constants, utils
+from . import breaker, catalog, customers, listings, products, stale
+from .models import Users
+from .pagination import get_paginator
+
+
+# Async (ASGI) variants of the Stripe-bound listing APIs, served under /payment/async/
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async views: renders the DRF Responses of utils and the paginators with the
+    first configured renderer (orjson), like the sync APIViews do.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = await super().dispatch(request, *args, **kwargs)
+
+        if isinstance(response, Response):
+            response.accepted_renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+            response.accepted_media_type = response.accepted_renderer.media_type
+            response.renderer_context = {"view": self, "args": args, "kwargs": kwargs, "request": request}
+        return response
+
+
+def _authenticate(request):
+    result = JWTAuthentication().authenticate(request)
+    return result[0] if result else None
+
+
+def jwt_required(handler):
+    """
+    Async equivalent of DRF's IsAuthenticated permission with JWT authentication.
+    """
+    @wraps(handler)
+    async def wrapper(self, request, *args, **kwargs):
+        try:
+            user = await sync_to_async(_authenticate)(request)
+        except AuthenticationFailed as e:
+            return utils.error_response(
+                message=str(e.detail),
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                api_status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if not user:
+            return utils.error_response(
+                message="Authentication credentials were not provided.",
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                api_status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        request.user = user
+        return await handler(self, request, *args, **kwargs)
+
+    return wrapper
+
+
+async def paginate(request, queryset, cursor_ordering):
+    """
+    Paginate a queryset with the same paginators as the sync views, off the event loop.
+
+    Returns:
+    - tuple: (paginator, page items).
+
+    Raises:
+    - NotFound: The requested page or cursor does not exist.
+    """
+    request = Request(request)
+    paginator = get_paginator(request, cursor_ordering)
+    items = await sync_to_async(paginator.paginate_queryset)(queryset, request)
+    return paginator, items
+
+
+def invalid_page_response(e):
+    return utils.error_response(
+        message=constants.MESSAGES["INVALID_PAGE"],
+        errors=str(e.detail),
+        status_code=status.HTTP_404_NOT_FOUND,
+        api_status_code=status.HTTP_404_NOT_FOUND,
+    )
+
+
+def stripe_unavailable_response(e):
+    return utils.error_response(
+        message=constants.MESSAGES["STRIPE_UNAVAILABLE"],
+        errors=str(e),
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        api_status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+class AsyncStripProductListView(AsyncAPIView):
+    """
+    Async API to Retrieve List of all the available products
+    """
+
+    @jwt_required
+    async def get(self, request, *args, **kwargs):
+        try:
+            # Served from the local catalog, Stripe is only hit on a cold miss
+            product_data, is_stale = await sync_to_async(catalog.get_products)()
+
+            response = utils.success_response(
+                message=constants.MESSAGES["PRODUCT_RETRIVED"],
+                data=product_data,
+            )
+            return stale.mark(response) if is_stale else response
+
+        except breaker.CircuitOpenError as e:
+            return stripe_unavailable_response(e)
+
+        except stripe.error.StripeError as e:
+            return utils.error_response(message=constants.MESSAGES["STRIPE_ERROR"], errors=str(e))
+
+        except Exception as e:
+            return utils.error_response(
+                message=constants.MESSAGES["UNEXPECTED_ERROR"],
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class AsyncSubscriptionByUserView(AsyncAPIView):
+    """
+    Async API to retrieve all products purchased by customers, with search by customer or product name.
+    """
+
+    @jwt_required
+    async def get(self, request, *args, **kwargs):
+        try:
+            search_query = request.GET.get("search", "").strip()
+
+            # Keyset pagination follows the ("-created", "id") index of the mirror
+            paginator, items = await paginate(request, listings.subscription_items(search_query), ("-created", "id"))
+
+            if not items and not search_query:
+                return utils.error_response(
+                    message=constants.MESSAGES["CUSTOMER_NOT_FOUND"],
+                    errors=constants.MESSAGES["UNAVAILABLE_CUSTOMERS"],
+                    status_code=status.HTTP_404_NOT_FOUND,
+                )
+
+            return paginator.get_paginated_response([listings.subscription_item_info(item) for item in items])
+
+        except NotFound as e:
+            return invalid_page_response(e)
+
+        except Exception as e:
+            return utils.error_response(
+                message=constants.MESSAGES["UNEXPECTED_ERROR"],
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class AsyncProductsByUserIDView(AsyncAPIView):
+    """
+    Async API to retrieve all products purchased by a customer using user ID.
+    """
+
+    @jwt_required
+    async def get(self, request, user_id, *args, **kwargs):
+        try:
+            try:
+                customer_id = await sync_to_async(customers.resolve_customer_id)(user_id)
+            except Users.DoesNotExist:
+                return utils.error_response(
+                    message=constants.MESSAGES["USER_NOT_FOUND"],
+                    errors="User ID does not exist.",
+                    status_code=status.HTTP_404_NOT_FOUND,
+                )
+
+            if not customer_id:
+                return utils.error_response(
+                    message=constants.MESSAGES["CUSTOMER_NOT_FOUND"],
+                    errors="No customer found with this email in Stripe.",
+                    status_code=status.HTTP_404_NOT_FOUND,
+                )
+
+            subscriptions = (await stripe.Subscription.list_async(customer=customer_id)).get("data", [])
+
+            if not subscriptions:
+                return utils.error_response(
+                    message="No active subscriptions found",
+                    errors="This customer does not have any active subscriptions.",
+                    status_code=status.HTTP_404_NOT_FOUND,
+                )
+
+            products_by_id = await products.aretrieve_products(
+                item["price"]["product"]
+                for subscription in subscriptions
+                for item in subscription["items"]["data"]
+            )
+
+            product_data = [
+                listings.purchased_product_info(subscription, item, products_by_id[item["price"]["product"]])
+                for subscription in subscriptions
+                for item in subscription["items"]["data"]
+            ]
+
+            return utils.success_response(message="Products retrieved successfully", data=product_data)
+
+        except breaker.CircuitOpenError as e:
+            return stripe_unavailable_response(e)
+
+        except stripe.error.InvalidRequestError as e:
+            return utils.error_response(message="Invalid request to Stripe", errors=str(e))
+
+        except stripe.error.RateLimitError:
+            return utils.error_response(
+                message="Stripe API rate limit exceeded",
+                errors="Too many requests to Stripe. Please try again later.",
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+
+        except stripe.error.StripeError as e:
+            return utils.error_response(
+                message="Stripe API Error",
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        except Exception as e:
+            return utils.error_response(
+                message="Unexpected error occurred",
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class AsyncProductRevenueView(AsyncAPIView):
+    """
+    Async API to calculate total price collection for each product.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            # Keyset pagination follows the product_id leading the rollup's unique index
+            paginator, rows = await paginate(request, listings.product_revenue(request.GET), ("product_id", "currency"))
+
+            return paginator.get_paginated_response(
+                {
+                    "message": constants.MESSAGES["REVENUE_CALCULATED"],
+                    "data": [listings.product_revenue_info(row) for row in rows],
+                }
+            )
+
+        except NotFound as e:
+            return invalid_page_response(e)
+
+        except Exception as e:
+            return utils.error_response(
+                message=constants.MESSAGES["UNEXPECTED_ERROR"],
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
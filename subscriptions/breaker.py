@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+from collections import deque
+import stripe
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(stripe.error.APIConnectionError):
+    """
+    Raised instead of calling Stripe while the circuit breaker is open.
+    """
+
+    def __init__(self, retry_in):
+        super().__init__(f"Stripe is unavailable, calls are suspended for {retry_in:.0f} more seconds.")
+        self.retry_in = retry_in
+
+
+_lock = threading.Lock()
+_state = CLOSED
+_opened_at = 0.0
+_probing = False
+# (finished at, failed, slow) of the calls of the last STRIPE_BREAKER_WINDOW seconds
+_calls = deque()
+
+# Per-process breaker counters, exposed by the Stripe client metrics API
+_metrics = {"trips": 0, "rejected_calls": 0, "failed_calls": 0, "slow_calls": 0}
+
+
+def allow():
+    """
+    Check that a call to Stripe may be sent.
+
+    While the breaker is open every call is rejected. Once STRIPE_BREAKER_OPEN_SECONDS have passed
+    it is half-open: a single probe call goes through, and its outcome closes or reopens the breaker.
+
+    Raises:
+    - CircuitOpenError: The breaker is open, or half-open with the probe call still running.
+    """
+    global _probing
+
+    with _lock:
+        now = time.monotonic()
+        if _current_state(now) == CLOSED:
+            return
+        if _state == HALF_OPEN and not _probing:
+            _probing = True
+            return
+
+        _metrics["rejected_calls"] += 1
+        raise CircuitOpenError(max(settings.STRIPE_BREAKER_OPEN_SECONDS - (now - _opened_at), 0))
+
+
+def record(failed, duration):
+    """
+    Record the outcome of a call to Stripe.
+
+    The breaker opens when, over the last STRIPE_BREAKER_WINDOW seconds and at least
+    STRIPE_BREAKER_MIN_CALLS calls, the share of failed calls reaches STRIPE_BREAKER_ERROR_RATE or
+    the share of calls slower than STRIPE_BREAKER_SLOW_CALL reaches STRIPE_BREAKER_SLOW_RATE.
+
+    Args:
+    - failed (bool): The call did not get an answer, or got a 5xx one.
+    - duration (float): Seconds the call took.
+    """
+    global _probing
+
+    slow = duration >= settings.STRIPE_BREAKER_SLOW_CALL
+    with _lock:
+        _metrics["failed_calls"] += failed
+        _metrics["slow_calls"] += slow
+
+        if _state == HALF_OPEN:
+            _probing = False
+            if failed or slow:
+                _open("probe call failed" if failed else "probe call was slow")
+            else:
+                _close()
+            return
+        if _state == OPEN:
+            # A call let through before the breaker opened
+            return
+
+        now = time.monotonic()
+        _calls.append((now, failed, slow))
+        while _calls and _calls[0][0] < now - settings.STRIPE_BREAKER_WINDOW:
+            _calls.popleft()
+
+        if len(_calls) < settings.STRIPE_BREAKER_MIN_CALLS:
+            return
+
+        error_rate = sum(call[1] for call in _calls) / len(_calls)
+        slow_rate = sum(call[2] for call in _calls) / len(_calls)
+        if error_rate >= settings.STRIPE_BREAKER_ERROR_RATE:
+            _open(f"{error_rate:.0%} of the calls failed")
+        elif slow_rate >= settings.STRIPE_BREAKER_SLOW_RATE:
+            _open(f"{slow_rate:.0%} of the calls were slow")
+
+
+def is_open():
+    """
+    Return True while calls to Stripe are suspended or only a probe call is allowed.
+    """
+    return state() != CLOSED
+
+
+def state():
+    """
+    Return the breaker state: CLOSED, OPEN or HALF_OPEN (the open period is over, a probe call may go through).
+    """
+    with _lock:
+        return _current_state(time.monotonic())
+
+
+def _current_state(now):
+    global _state
+
+    if _state == OPEN and now - _opened_at >= settings.STRIPE_BREAKER_OPEN_SECONDS:
+        _state = HALF_OPEN
+    return _state
+
+
+def _open(reason):
+    global _state, _opened_at
+
+    _state = OPEN
+    _opened_at = time.monotonic()
+    _calls.clear()
+    _metrics["trips"] += 1
+    logger.warning("Stripe circuit breaker opened: %s", reason)
+
+
+def _close():
+    global _state
+
+    _state = CLOSED
+    logger.info("Stripe circuit breaker closed")
+
+
+def get_metrics():
+    """
+    Return the breaker state and counters of this process.
+
+    Returns:
+    - dict: Current state, times it opened, calls rejected while open, failed and slow calls.
+    """
+    with _lock:
+        return dict(_metrics, state=_current_state(time.monotonic()))
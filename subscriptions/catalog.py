@@ -0,0 +1,220 @@
+from datetime import timedelta
+import logging
+import stripe
+from django.conf import settings
+from django.utils import timezone
+from . import stale
+from .models import StripeProduct
+from .products import list_products
+
+logger = logging.getLogger(__name__)
+
+# Webhook events that keep the local catalog in sync with Stripe
+PRODUCT_EVENTS = ("product.created", "product.updated", "product.deleted")
+PRICE_EVENTS = ("price.created", "price.updated", "price.deleted")
+
+PRICE_FIELDS = ["default_price_id", "unit_amount", "currency", "recurring"]
+PRODUCT_FIELDS = ["name", "description", "metadata", "is_active", "synced_at"] + PRICE_FIELDS
+
+
+def get_products():
+    """
+    Return the product catalog in the product list API format.
+
+    The catalog is served from the local StripeProduct table in a single query. Stripe is
+    only contacted on a cold miss, when the table is empty. Once its oldest row is older
+    than STRIPE_CATALOG_TTL the rows are still served, marked stale, and the catalog is
+    refreshed in the background.
+
+    Returns:
+    - tuple: (products, stale), one dict per product matching the StripProductListView payload.
+    """
+    rows = list(catalog_rows())
+
+    if not rows:
+        rows = refresh()
+    elif is_expired(rows):
+        stale.revalidate("catalog", refresh)
+        return [product_info(row) for row in rows], True
+
+    return [product_info(row) for row in rows], False
+
+
+def catalog_rows():
+    """
+    Return the queryset of catalog rows served by the product list API.
+    """
+    return StripeProduct.objects.order_by("name", "product_id")[:settings.STRIPE_CATALOG_MAX_SIZE]
+
+
+def is_expired(rows):
+    """
+    Return True when the catalog is empty or its oldest row is older than STRIPE_CATALOG_TTL.
+    """
+    expires_before = timezone.now() - timedelta(seconds=settings.STRIPE_CATALOG_TTL)
+    return not rows or min(row.synced_at for row in rows) < expires_before
+
+
+def refresh():
+    """
+    Reload the whole catalog from Stripe and replace the local rows.
+
+    Returns:
+    - list: The refreshed StripeProduct rows.
+    """
+    return store(list_products())
+
+
+def store(products):
+    """
+    Replace the local catalog with the given products.
+
+    Args:
+    - products (iterable): (product, default_price) pairs covering every product in the account.
+
+    Returns:
+    - list: The stored StripeProduct rows, in catalog order.
+    """
+    now = timezone.now()
+    rows = [_build_row(product, price, now) for product, price in products]
+
+    StripeProduct.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["product_id"],
+        update_fields=PRODUCT_FIELDS,
+    )
+    StripeProduct.objects.exclude(product_id__in=[row.product_id for row in rows]).delete()
+    # Every row was just synced, evicting some would only make the next page load a cold miss
+    if len(rows) > settings.STRIPE_CATALOG_MAX_SIZE:
+        logger.warning(
+            "Stripe catalog has %s products, more than STRIPE_CATALOG_MAX_SIZE (%s)",
+            len(rows), settings.STRIPE_CATALOG_MAX_SIZE,
+        )
+
+    return sorted(rows, key=lambda row: (row.name or "", row.product_id))[:settings.STRIPE_CATALOG_MAX_SIZE]
+
+
+def handle_product_event(event_type, product):
+    """
+    Apply a product.* webhook event to the local catalog.
+    """
+    if event_type == "product.deleted":
+        StripeProduct.objects.filter(product_id=product["id"]).delete()
+        return
+
+    row = StripeProduct.objects.filter(product_id=product["id"]).first()
+    price = None
+    if product.get("default_price"):
+        if row and row.default_price_id == product["default_price"]:
+            price = row
+        else:
+            price = stripe.Price.retrieve(product["default_price"])
+
+    row = _build_row(product, price, timezone.now())
+    StripeProduct.objects.update_or_create(
+        product_id=row.product_id,
+        defaults={field: getattr(row, field) for field in PRODUCT_FIELDS},
+    )
+    _evict(keep=row.product_id)
+
+
+def handle_price_event(event_type, price):
+    """
+    Apply a price.* webhook event to every catalog row using the price as its default.
+    """
+    rows = StripeProduct.objects.filter(default_price_id=price["id"])
+
+    if event_type == "price.deleted":
+        rows.update(default_price_id=None, unit_amount=None, currency=None, recurring=None, synced_at=timezone.now())
+    else:
+        rows.update(
+            unit_amount=price.get("unit_amount"),
+            currency=price.get("currency"),
+            recurring=_to_dict(price.get("recurring")),
+            synced_at=timezone.now(),
+        )
+
+
+def product_info(row):
+    """
+    Build the API representation of a catalog row.
+    """
+    if not row.default_price_id:
+        return {
+            "id": row.product_id,
+            "name": row.name,
+            "description": row.description,
+            "default_price": None,
+        }
+
+    return {
+        "id": row.product_id,
+        "name": row.name,
+        "description": row.description,
+        "metadata": {
+            "Type": row.metadata
+        },
+        "default_price": {
+            "id": row.default_price_id,
+            "unit_amount": row.unit_amount / 100 if row.unit_amount is not None else None,
+            "currency": row.currency,
+            "recurring": row.recurring,
+        },
+    }
+
+
+def _build_row(product, price, synced_at):
+    """
+    Build an unsaved StripeProduct from a Stripe product and its (expanded) default price.
+
+    `price` may be a Stripe Price, an existing StripeProduct row carrying the price fields,
+    or None when the product has no default price.
+    """
+    row = StripeProduct(
+        product_id=product["id"],
+        name=product.get("name"),
+        description=product.get("description"),
+        metadata=_to_dict(product.get("metadata")) or {},
+        is_active=product.get("active", True),
+        synced_at=synced_at,
+    )
+
+    if isinstance(price, StripeProduct):
+        for field in PRICE_FIELDS:
+            setattr(row, field, getattr(price, field))
+    elif price:
+        row.default_price_id = price["id"]
+        row.unit_amount = price.get("unit_amount")
+        row.currency = price.get("currency")
+        row.recurring = _to_dict(price.get("recurring"))
+
+    return row
+
+
+def _evict(keep):
+    """
+    Keep the catalog within STRIPE_CATALOG_MAX_SIZE by dropping the least recently synced rows.
+
+    Rows synced at the same time are evicted by product ID, so the same rows go whatever the
+    database returns first. The row of `keep` (the product just written) is never evicted.
+    """
+    evicted = list(
+        StripeProduct.objects.exclude(product_id=keep)
+        .order_by("-synced_at", "product_id")
+        .values_list("product_id", flat=True)[max(settings.STRIPE_CATALOG_MAX_SIZE - 1, 0):]
+    )
+    if evicted:
+        logger.warning("Stripe catalog is over STRIPE_CATALOG_MAX_SIZE, evicting %s", ", ".join(evicted))
+        StripeProduct.objects.filter(product_id__in=evicted).delete()
+
+
+def _to_dict(value):
+    """
+    Convert nested StripeObjects into plain dicts and lists so they can be stored in a JSONField.
+    """
+    if isinstance(value, dict):
+        return {key: _to_dict(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+    return value
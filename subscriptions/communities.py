@@ -0,0 +1,25 @@
+import uuid
+from .models import ClaimCommunityRequest
+
+# Claim request statuses that allow subscribing to a community
+SUBSCRIBABLE_STATUSES = ("accept", "pending")
+
+
+def resolve_communities(community_ids, statuses=SUBSCRIBABLE_STATUSES):
+    """
+    Fetch the communities behind the claim requests of `community_ids`, in one joined query.
+
+    Args:
+    - community_ids (iterable): Community UUIDs, as strings or UUID objects.
+    - statuses (tuple, optional): Claim request statuses to accept, None accepts any status.
+
+    Returns:
+    - dict: Community UUID -> CommunityInformation, for the communities with a matching claim request.
+    """
+    claims = ClaimCommunityRequest.objects.select_related("claim_for_community_id").filter(
+        claim_for_community_id_id__in=[uuid.UUID(str(community_id)) for community_id in community_ids],
+    )
+    if statuses is not None:
+        claims = claims.filter(status__in=statuses)
+
+    return {claim.claim_for_community_id_id: claim.claim_for_community_id for claim in claims}
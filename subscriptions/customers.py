@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+import stripe
+from django.conf import settings
+from .models import Users
+
+# Per-process LRU of user ID -> (Stripe customer ID, expiry), in front of Users.stripe_customer_id
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def resolve_customer_id(user_id):
+    """
+    Return the Stripe customer ID of a local user.
+
+    The in-process cache is tried first, then the customer ID stored on the user. Users not linked yet
+    (created before the link was recorded) are searched in Stripe by email once and linked.
+
+    Returns:
+    - str: The Stripe customer ID, or None when the user has no Stripe customer.
+
+    Raises:
+    - Users.DoesNotExist: The user does not exist.
+    """
+    customer_id = _get_cached(user_id)
+    if customer_id:
+        return customer_id
+
+    user = Users.objects.only("id", "email", "stripe_customer_id").get(id=user_id)
+    customer_id = user.stripe_customer_id
+
+    if not customer_id and user.email:
+        customers = stripe.Customer.list(email=user.email, limit=1).get("data", [])
+        if customers:
+            customer_id = customers[0]["id"]
+            Users.objects.filter(id=user.id, stripe_customer_id__isnull=True).update(stripe_customer_id=customer_id)
+
+    if customer_id:
+        _set_cached(user.id, customer_id)
+
+    return customer_id
+
+
+def link(user_id, customer_id):
+    """
+    Record the Stripe customer of a user (from checkout sessions), keeping the first one linked.
+    """
+    if not user_id or not customer_id:
+        return
+
+    Users.objects.filter(id=user_id, stripe_customer_id__isnull=True).update(stripe_customer_id=customer_id)
+    forget_user(user_id)
+
+
+def link_by_email(customers):
+    """
+    Link users without a Stripe customer to the given customers by email.
+
+    Args:
+    - customers (dict): email -> Stripe customer ID.
+
+    Returns:
+    - int: Number of users linked.
+    """
+    users = list(Users.objects.filter(email__in=customers, stripe_customer_id__isnull=True).only("id", "email"))
+
+    for user in users:
+        user.stripe_customer_id = customers[user.email]
+    Users.objects.bulk_update(users, ["stripe_customer_id"])
+
+    return len(users)
+
+
+def unlink(customer_id):
+    """
+    Forget a Stripe customer that was deleted.
+    """
+    user_ids = list(Users.objects.filter(stripe_customer_id=customer_id).values_list("id", flat=True))
+    Users.objects.filter(id__in=user_ids).update(stripe_customer_id=None)
+
+    for user_id in user_ids:
+        forget_user(user_id)
+
+
+def forget_user(user_id):
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+def _get_cached(user_id):
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry is None:
+            return None
+
+        customer_id, expires = entry
+        if expires < time.monotonic():
+            del _cache[user_id]
+            return None
+
+        _cache.move_to_end(user_id)
+        return customer_id
+
+
+def _set_cached(user_id, customer_id):
+    with _cache_lock:
+        _cache[user_id] = (customer_id, time.monotonic() + settings.STRIPE_CUSTOMER_CACHE_TTL)
+        _cache.move_to_end(user_id)
+
+        while len(_cache) > settings.STRIPE_CUSTOMER_CACHE_SIZE:
+            _cache.popitem(last=False)
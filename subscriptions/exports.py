@@ -0,0 +1,52 @@
+import csv
+import json
+from django.http import StreamingHttpResponse
+
+
+# Streaming export formats supported by the listing APIs (`?export=ndjson` / `?export=csv`)
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class Echo:
+    """
+    File-like object handing back what the csv writer writes, so rows can be streamed one by one.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_rows(rows, export_format, fields, filename):
+    """
+    Stream rows as NDJSON or CSV while they are produced.
+
+    Memory stays constant whatever the number of rows, as long as `rows` is lazy (a Stripe
+    `auto_paging_iter()`, a queryset `.iterator()`...).
+
+    Args:
+    - rows (iterable): Dicts to export.
+    - export_format (str): One of EXPORT_FORMATS.
+    - fields (list): Column order for CSV exports.
+    - filename (str): Download name, without extension.
+
+    Returns:
+    - StreamingHttpResponse: The streaming export.
+    """
+    if export_format == "csv":
+        writer = csv.DictWriter(Echo(), fieldnames=fields, extrasaction="ignore")
+        content = _csv_lines(writer, rows)
+    else:
+        content = (json.dumps(row, default=str) + "\n" for row in rows)
+
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+def _csv_lines(writer, rows):
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,67 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the process-wide pool used for Stripe fan-out, sized by STRIPE_FETCH_MAX_WORKERS.
+
+    The pool is shared by every request, so the worker cap also bounds how many concurrent
+    Stripe calls a process makes. Functions run on it must not fan out again themselves.
+    """
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.STRIPE_FETCH_MAX_WORKERS,
+                    thread_name_prefix="stripe-fetch",
+                )
+    return _executor
+
+
+def fetch_concurrently(fetch, keys):
+    """
+    Call `fetch(key)` for every distinct key on the shared pool.
+
+    Args:
+    - fetch (callable): Function doing a single Stripe call, e.g. `stripe.Product.retrieve`.
+    - keys (iterable): Keys to fetch, duplicates are fetched once.
+
+    Returns:
+    - dict: key -> result of `fetch(key)`.
+
+    Raises:
+    - stripe.error.StripeError: The first error raised by any fetch. Rate limited calls are already
+      retried by the Stripe client (see stripe_client.PooledRequestsClient).
+    """
+    unique_keys = list(dict.fromkeys(keys))
+
+    if len(unique_keys) <= 1:
+        return {key: fetch(key) for key in unique_keys}
+
+    # Each call runs in a copy of the caller's context, so it is counted against the caller's request
+    futures = {
+        key: get_executor().submit(contextvars.copy_context().run, _fetch_on_worker, fetch, key)
+        for key in unique_keys
+    }
+    return {key: future.result() for key, future in futures.items()}
+
+
+def _fetch_on_worker(fetch, key):
+    """
+    Call `fetch(key)` on a pool thread, releasing the database connection it may have opened (the
+    shared rate limit is leased through the database) like a request would.
+    """
+    close_old_connections()
+    try:
+        return fetch(key)
+    finally:
+        close_old_connections()
@@ -0,0 +1,219 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Metrics of the request being served, shared with the fan-out threads working for it
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+# Per-process totals by route, exposed by the request metrics API
+_routes = {}
+_routes_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """
+    Stripe calls and SQL queries made while serving one request.
+    """
+
+    def __init__(self):
+        self.stripe_calls = Counter()
+        self.stripe_time = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_stripe_call(self, label, duration):
+        with self._lock:
+            self.stripe_calls[label] += 1
+            self.stripe_time += duration
+
+    def add_query(self, duration):
+        with self._lock:
+            self.db_queries += 1
+            self.db_time += duration
+
+
+def record_stripe_call(method, url, duration):
+    """
+    Count a Stripe API call against the current request, labelled like "GET /v1/products/{id}".
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_stripe_call(stripe_call_label(method, url), duration)
+
+
+def stripe_call_label(method, url):
+    """
+    Label a Stripe API call by method and path, with the object IDs replaced by {id}.
+    """
+    version, *resources = urlsplit(url).path.strip("/").split("/")
+    path = [part if index % 2 == 0 else "{id}" for index, part in enumerate(resources)]
+    return f"{method.upper()} /" + "/".join([version] + path)
+
+
+def _timed_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper timing every query against the request in the current context.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - started)
+
+
+def _install_query_timer(connection, **kwargs):
+    """
+    Add the query timer to a database connection, once. Connections are per thread, so the timer
+    finds the request through the context (also propagated to the threads of sync_to_async).
+    """
+    if _timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_query)
+
+
+connection_created.connect(_install_query_timer)
+
+
+class InstrumentationMiddleware:
+    """
+    Count and time the Stripe calls and SQL queries of every request.
+
+    The totals are sent back in a Server-Timing header, logged as one JSON line per request and
+    aggregated by route for the request metrics API. Calls made while a streaming response is being
+    consumed happen after the middleware returns and are not counted. Works under WSGI and ASGI,
+    async views are not moved to a thread by this middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        # Connections opened before this module was loaded
+        for connection in connections.all():
+            _install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return _finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return _finish(request, response, metrics, time.perf_counter() - started)
+
+
+def _finish(request, response, metrics, duration):
+    """
+    Add the Server-Timing header, log the request and add it to the per-route totals.
+    """
+    stripe_calls = sum(metrics.stripe_calls.values())
+    response["Server-Timing"] = ", ".join([
+        f'stripe;dur={metrics.stripe_time * 1000:.1f};desc="{stripe_calls} calls"',
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"',
+        f"total;dur={duration * 1000:.1f}",
+    ])
+
+    route = _route(request)
+    _aggregate(route, duration, metrics)
+
+    logger.info(json.dumps({
+        "event": "request",
+        "method": request.method,
+        "route": route,
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 1),
+        "stripe_calls": stripe_calls,
+        "stripe_ms": round(metrics.stripe_time * 1000, 1),
+        "stripe_by_call": dict(metrics.stripe_calls),
+        "db_queries": metrics.db_queries,
+        "db_ms": round(metrics.db_time * 1000, 1),
+    }))
+
+    return response
+
+
+def get_metrics():
+    """
+    Return the per-route totals of this process, with averages per request.
+
+    Returns:
+    - list: One dict per route, busiest first.
+    """
+    with _routes_lock:
+        routes = [(route, dict(totals, stripe_by_call=dict(totals["stripe_by_call"]))) for route, totals in _routes.items()]
+
+    result = []
+    for route, totals in routes:
+        requests = totals["requests"]
+        result.append({
+            "route": route,
+            "requests": requests,
+            "avg_duration_ms": round(totals["duration"] * 1000 / requests, 1),
+            "avg_stripe_calls": round(totals["stripe_calls"] / requests, 2),
+            "avg_stripe_ms": round(totals["stripe_time"] * 1000 / requests, 1),
+            "avg_db_queries": round(totals["db_queries"] / requests, 2),
+            "avg_db_ms": round(totals["db_time"] * 1000 / requests, 1),
+            "stripe_by_call": totals["stripe_by_call"],
+        })
+
+    return sorted(result, key=lambda row: row["requests"], reverse=True)
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    # Unresolved paths are grouped together, so 404 scans cannot grow the totals without bound
+    return f"{request.method} /{match.route}" if match else f"{request.method} (unresolved)"
+
+
+def _aggregate(route, duration, metrics):
+    with _routes_lock:
+        totals = _routes.setdefault(route, {
+            "requests": 0,
+            "duration": 0.0,
+            "stripe_calls": 0,
+            "stripe_time": 0.0,
+            "db_queries": 0,
+            "db_time": 0.0,
+            "stripe_by_call": Counter(),
+        })
+        totals["requests"] += 1
+        totals["duration"] += duration
+        totals["stripe_calls"] += sum(metrics.stripe_calls.values())
+        totals["stripe_time"] += metrics.stripe_time
+        totals["db_queries"] += metrics.db_queries
+        totals["db_time"] += metrics.db_time
+        totals["stripe_by_call"].update(metrics.stripe_calls)
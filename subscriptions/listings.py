@@ -0,0 +1,128 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from . import revenue
+from .models import ProductRevenue, StripeCustomer, StripeSubscriptionItem
+from .projections import Many, Projection
+
+
+# Query builders and row formatters shared by the sync (DRF) and async listing views
+
+def subscription_items(search_query=""):
+    """
+    Return the mirrored subscription items, newest first, optionally filtered by customer or product name.
+
+    Ended subscriptions are left out, like the default Stripe Subscription.list the listing used to call.
+    Searches are served by the trigram indexes on the customer and product names, and the matches are
+    ranked by how similar the closer of the two names is to the search.
+    """
+    items = StripeSubscriptionItem.objects.select_related("customer").exclude(status__in=revenue.EXCLUDED_STATUSES)
+
+    if not search_query:
+        return items.order_by("-created", "id")
+
+    # Two single-table conditions, each able to use its own trigram index (an OR across the join cannot)
+    matching_customers = StripeCustomer.objects.filter(name__icontains=search_query).values("id")
+
+    return items.filter(
+        Q(customer__in=matching_customers) | Q(product_name__icontains=search_query)
+    ).annotate(
+        rank=Greatest(
+            TrigramSimilarity(Coalesce("customer__name", Value("")), search_query),
+            TrigramSimilarity(Coalesce("product_name", Value("")), search_query),
+        )
+    ).order_by("-rank", "-created", "id")
+
+
+def subscription_item_info(item):
+    """
+    Build the user subscriptions API representation of a mirrored subscription item.
+    """
+    return {
+        "customer_name": item.customer.name or "N/A",
+        "product_name": item.product_name or "Unknown Product",
+        "purchased_date": int(item.created.timestamp()),
+        "amount_paid": item.unit_amount / 100,
+        "currency": item.currency,
+    }
+
+
+def product_revenue(params):
+    """
+    Return the revenue per product matching the Search_* query parameters, as one GROUP BY over the rollup.
+    """
+    search_state = params.get("Search_State", "").lower().strip()
+    search_service = params.get("Search_Service", "").lower().strip()
+    search_product = params.get("Search_Product", "").lower().strip()
+    search_month = params.get("Search_Month", "").lower().strip()
+    search_year = params.get("Search_Year", "").lower().strip()
+
+    buckets = ProductRevenue.objects.all()
+
+    if search_state:
+        buckets = buckets.filter(state__iexact=search_state)
+    if search_service:
+        buckets = buckets.filter(service__icontains=search_service)
+    if search_product:
+        buckets = buckets.filter(product_name__icontains=search_product)
+    if search_month:
+        buckets = buckets.filter(month=int(search_month)) if search_month.isdigit() else buckets.none()
+    if search_year:
+        buckets = buckets.filter(year=int(search_year)) if search_year.isdigit() else buckets.none()
+
+    return (
+        buckets.values("product_id", "product_name", "currency")
+        .annotate(revenue=Sum("total_amount"))
+        .order_by("product_name", "product_id", "currency")
+    )
+
+
+def product_revenue_info(row):
+    """
+    Build the revenue API representation of an aggregated revenue row.
+    """
+    return {
+        "product_name": row["product_name"] or "Unknown Product",
+        "total_revenue": row["revenue"] / 100,
+        "currency": row["currency"],
+    }
+
+
+def purchased_product_info(subscription, item, product):
+    """
+    Build the user subscription information API representation of a Stripe subscription item.
+    """
+    return {
+        "subscription_id": subscription["id"],
+        "product_id": product["id"],
+        "product_name": product.get("name", "N/A"),
+        "product_description": product.get("description", "N/A"),
+        "product_type": product.get("type", "N/A"),
+        "quantity": item.get("quantity", 1),
+        "price_amount": item["price"]["unit_amount"] / 100,  # Convert to dollars
+        "currency": item["price"]["currency"].upper(),
+        "interval": item["price"].get("recurring", {}).get("interval", "none"),
+    }
+
+
+# Response shape of the subscription plan API, clients can narrow it with `fields=`
+PLAN_PROJECTION = Projection(
+    "id", "object", "active", "billing_scheme", "created", "currency", "interval", "interval_count",
+    "livemode", "product", "usage_type",
+)
+PRICE_PROJECTION = Projection(
+    "id", "object", "active", "billing_scheme", "created", "currency", "livemode", "product", "recurring",
+    "tax_behavior", "type", "unit_amount", "unit_amount_decimal",
+)
+SUBSCRIPTION_ITEM_PROJECTION = Projection(
+    "id", "object", "created", "quantity", "subscription",
+    plan=PLAN_PROJECTION,
+    price=PRICE_PROJECTION,
+)
+SUBSCRIPTION_PLAN_PROJECTION = Projection(
+    "id", "object", "billing_cycle_anchor", "cancel_at_period_end", "collection_method", "created",
+    "currency", "current_period_end", "current_period_start", "customer", "default_payment_method",
+    "quantity", "start_date", "status", "trial_settings",
+    items=Projection("object", "total_count", "url", data=Many(SUBSCRIPTION_ITEM_PROJECTION)),
+    plan=PLAN_PROJECTION,
+)
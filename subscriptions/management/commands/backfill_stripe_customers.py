@@ -0,0 +1,33 @@
+import stripe
+from django.core.management.base import BaseCommand
+from subscriptions import customers, stripe_client
+from subscriptions.models import Users
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = "Link users without a Stripe customer ID to their Stripe customer, matched by email"
+
+    def handle(self, *args, **options):
+        stripe_client.configure()
+
+        pending = Users.objects.filter(stripe_customer_id__isnull=True, email__isnull=False).count()
+        if not pending:
+            self.stdout.write(self.style.SUCCESS("Every user is already linked"))
+            return
+
+        # One pass over the customer list is far cheaper than one email search per user.
+        # Customers are listed newest first, the first customer seen for an email is kept.
+        linked = 0
+        batch = {}
+        for customer in stripe.Customer.list(limit=BATCH_SIZE).auto_paging_iter():
+            if customer.get("email"):
+                batch.setdefault(customer["email"], customer["id"])
+            if len(batch) >= BATCH_SIZE:
+                linked += customers.link_by_email(batch)
+                batch = {}
+        if batch:
+            linked += customers.link_by_email(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Linked {linked} of {pending} users to their Stripe customer"))
@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from subscriptions import stripe_client, tasks, webhooks
+
+# Inbox rows submitted per pass
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Process due Stripe webhook events from the inbox: failed attempts once their retry delay has passed, "
+        "and events left behind by stopped or crashed processes. Run it with --loop to keep retrying"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling the inbox instead of exiting when empty")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        stripe_client.configure()
+
+        while True:
+            event_pks = list(webhooks.pending_events().values_list("pk", flat=True)[:BATCH_SIZE])
+            futures = [tasks.submit(webhooks.process_event, event_pk) for event_pk in event_pks]
+
+            processed = 0
+            for event_pk, future in zip(event_pks, futures):
+                try:
+                    processed += bool(future.result())
+                except Exception as e:
+                    # Already logged by the worker pool, the event stays in the inbox for the next pass
+                    self.stderr.write(self.style.ERROR(f"Webhook event {event_pk} could not be processed: {e}"))
+
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"Processed {processed} webhook events"))
+
+            if not options["loop"]:
+                break
+            # Poll again right away only when there may be more due events than one batch
+            if len(event_pks) < BATCH_SIZE:
+                time.sleep(options["interval"])
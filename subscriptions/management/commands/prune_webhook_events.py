@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from subscriptions import webhooks
+
+
+class Command(BaseCommand):
+    help = "Delete processed Stripe webhook events older than STRIPE_WEBHOOK_DEDUP_RETENTION days"
+
+    def handle(self, *args, **options):
+        deleted_events, deleted_inbox = webhooks.prune_processed_events()
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {deleted_events} processed event IDs and {deleted_inbox} inbox rows"
+        ))
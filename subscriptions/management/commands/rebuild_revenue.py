@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from subscriptions import revenue
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product revenue rollup from the local subscription mirror"
+
+    def handle(self, *args, **options):
+        buckets = revenue.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} revenue buckets"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from subscriptions import price_migration, stripe_client, tasks
+from subscriptions.models import PriceMigrationJob
+
+
+class Command(BaseCommand):
+    help = "Run pending subscription price migrations and resume the ones left behind by crashed workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry-failed", action="store_true", help="Also resume jobs that stopped on an error")
+
+    def handle(self, *args, **options):
+        stripe_client.configure()
+
+        if options["retry_failed"]:
+            PriceMigrationJob.objects.filter(status="failed").update(status="pending", last_error=None, finished_date=None)
+
+        job_pks = list(price_migration.resumable_jobs().values_list("pk", flat=True))
+        futures = [tasks.submit_to(tasks.PRICE_MIGRATION_POOL, price_migration.run_job, job_pk) for job_pk in job_pks]
+        resumed = sum(1 for future in futures if future.result())
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {resumed} price migration jobs"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from subscriptions import stripe_client, sync
+
+
+class Command(BaseCommand):
+    help = "Mirror Stripe customers, subscriptions and subscription items into the local tables"
+
+    def handle(self, *args, **options):
+        stripe_client.configure()
+
+        counts = sync.sync_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {counts['customers']} customers and {counts['subscriptions']} subscriptions"
+        ))
@@ -1,5 +1,7 @@
 import uuid
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 
@@ -32,6 +34,7 @@ class Users(AbstractUser, BaseModel):
     city = models.CharField(max_length=255, null=True, blank=True) 
     state = models.CharField(max_length=255, null=True, blank=True) 
     image = models.ImageField(upload_to='images/', null=True, blank=True)
+    stripe_customer_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     
     REQUIRED_FIELDS = [ 'password',]
     USERNAME_FIELD = 'email'
@@ -40,15 +43,257 @@ class Users(AbstractUser, BaseModel):
         return self.email
 
 
+class CommunityInformation(BaseModel):
+    """
+    A community users can subscribe to, referenced by its UUID in the checkout session metadata.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255, null=True, blank=True)
+
+    def __str__(self):
+        return f"Community {self.id} - {self.name}"
+
+
+class ClaimCommunityRequest(BaseModel):
+    """
+    Request to claim a community, only claimed communities (accepted or pending) can be subscribed to.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("accept", "Accept"),
+        ("reject", "Reject"),
+    ]
+
+    claim_for_community_id = models.ForeignKey(CommunityInformation, on_delete=models.CASCADE, related_name="claim_requests")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+
+    def __str__(self):
+        return f"Claim {self.claim_for_community_id_id} - {self.status}"
+
+
 class Subscription(BaseModel):
     status_choices = [("active", "Active"), ("canceled", "Canceled"), ("paid", "Paid")]
 
     product_id = models.CharField(max_length=255)
     user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="user_subscriptions")
+    community = models.ForeignKey(CommunityInformation, on_delete=models.CASCADE, related_name="community_subscriptions")
     stripe_subscription_id = models.CharField(max_length=255, null=True, blank=True)
     trial_end_date = models.DateTimeField(null=True, blank=True)
     payment_amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_status = models.CharField(max_length=50, choices=status_choices)
 
+    class Meta:
+        constraints = [
+            # Conflict target of the bulk upsert done for checkout.session.completed, its leading
+            # stripe_subscription_id column also serves the webhook/sync lookups by subscription ID
+            models.UniqueConstraint(
+                fields=["stripe_subscription_id", "community", "user", "product_id"],
+                name="unique_subscription_community_product",
+            ),
+        ]
+        indexes = [
+            # Active free trial check of FreeTrialSubscription
+            models.Index(
+                fields=["user", "community", "trial_end_date"],
+                condition=models.Q(payment_status="paid", trial_end_date__isnull=False),
+                name="subscription_active_trial_idx",
+            ),
+            # Admin payment_status filter, newest first
+            models.Index(fields=["payment_status", "-id"], name="subscription_status_idx"),
+        ]
+
     def __str__(self):
         return f"Subscription {self.stripe_subscription_id} - {self.payment_status}"
+
+
+class StripeProduct(BaseModel):
+    """
+    Local copy of a Stripe product and its default price, kept fresh by product.* / price.* webhooks.
+    """
+    product_id = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255, null=True, blank=True)
+    description = models.TextField(null=True, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    default_price_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    unit_amount = models.BigIntegerField(null=True, blank=True)
+    currency = models.CharField(max_length=10, null=True, blank=True)
+    recurring = models.JSONField(null=True, blank=True)
+    synced_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Product {self.product_id} - {self.name}"
+
+
+class StripeCustomer(BaseModel):
+    """
+    Local mirror of a Stripe customer.
+    """
+    customer_id = models.CharField(max_length=255, unique=True)
+    email = models.EmailField(max_length=255, null=True, blank=True, db_index=True)
+    name = models.CharField(max_length=255, null=True, blank=True)
+    user = models.ForeignKey(Users, on_delete=models.SET_NULL, null=True, blank=True, related_name="stripe_customers")
+    created = models.DateTimeField(null=True, blank=True)
+    # Creation time of the Stripe event (or sync) the row was last written from, older payloads are skipped
+    event_created = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Customer name search (ILIKE and trigram similarity), needs the pg_trgm extension
+            GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="stripe_customer_name_trgm_idx"),
+        ]
+
+    def __str__(self):
+        return f"Customer {self.customer_id} - {self.email}"
+
+
+class StripeSubscriptionItem(BaseModel):
+    """
+    Local mirror of a Stripe subscription item, denormalized with the subscription and product fields the
+    listing APIs need so they can be answered with a single query.
+    """
+    item_id = models.CharField(max_length=255, unique=True)
+    subscription_id = models.CharField(max_length=255, db_index=True)
+    customer = models.ForeignKey(StripeCustomer, on_delete=models.CASCADE, related_name="subscription_items")
+    status = models.CharField(max_length=50)
+    product_id = models.CharField(max_length=255, db_index=True)
+    product_name = models.CharField(max_length=255, null=True, blank=True)
+    price_id = models.CharField(max_length=255, null=True, blank=True)
+    unit_amount = models.BigIntegerField(default=0)
+    currency = models.CharField(max_length=10, null=True, blank=True)
+    quantity = models.PositiveIntegerField(default=1)
+    interval = models.CharField(max_length=20, null=True, blank=True)
+    created = models.DateTimeField()
+    trial_end = models.DateTimeField(null=True, blank=True)
+    canceled_at = models.DateTimeField(null=True, blank=True)
+    # When the subscription actually ended, canceled_at is set as soon as a cancellation at period end is requested
+    ended_at = models.DateTimeField(null=True, blank=True)
+    current_period_end = models.DateTimeField(null=True, blank=True)
+    # Revenue reporting dimensions, copied from the customer's user and the product metadata
+    state = models.CharField(max_length=255, default="", blank=True)
+    service = models.CharField(max_length=255, default="", blank=True)
+    # Creation time of the Stripe event (or sync) the row was last written from, older payloads are skipped
+    event_created = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created", "id"], name="sub_item_created_idx"),
+            # Product name search (ILIKE and trigram similarity), needs the pg_trgm extension
+            GinIndex(fields=["product_name"], opclasses=["gin_trgm_ops"], name="sub_item_product_trgm_idx"),
+        ]
+
+    def __str__(self):
+        return f"Subscription item {self.item_id} - {self.product_id}"
+
+
+class ProductRevenue(models.Model):
+    """
+    Pre-aggregated subscription revenue per product, month and currency (amounts in cents).
+
+    Maintained incrementally from the subscription mirror and rebuilt with `manage.py rebuild_revenue`.
+    """
+    product_id = models.CharField(max_length=255)
+    product_name = models.CharField(max_length=255, null=True, blank=True)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    currency = models.CharField(max_length=10)
+    state = models.CharField(max_length=255, default="", blank=True)
+    service = models.CharField(max_length=255, default="", blank=True)
+    total_amount = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product_id", "year", "month", "currency", "state", "service"],
+                name="unique_product_revenue_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["year", "month"], name="product_revenue_period_idx"),
+        ]
+
+    def __str__(self):
+        return f"Revenue {self.product_id} {self.year}-{self.month:02d} {self.currency}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Durable inbox of verified Stripe webhook events, processed asynchronously by the worker pool.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("processed", "Processed"),
+        ("failed", "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, db_index=True)
+    event_type = models.CharField(max_length=255)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # Earliest time a failed event may be attempted again, null when it is due right away
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    received_date = models.DateTimeField(auto_now_add=True)
+    processed_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "received_date"], name="webhook_event_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Webhook {self.event_id} ({self.event_type}) - {self.status}"
+
+
+class ProcessedEvent(models.Model):
+    """
+    Index of Stripe event IDs that have already been handled, used to drop redelivered events.
+    """
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=255)
+    processed_date = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Processed {self.event_id} ({self.event_type})"
+
+
+class PriceMigrationJob(BaseModel):
+    """
+    Background job moving every subscription of a product from its old prices to a new default price.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    product_id = models.CharField(max_length=255)
+    new_price_id = models.CharField(max_length=255)
+    old_price_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True)
+    # Resume point: index into old_price_ids and the Stripe `starting_after` subscription ID
+    cursor = models.JSONField(default=dict, blank=True)
+    processed_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    failed_subscription_ids = models.JSONField(default=list, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    started_date = models.DateTimeField(null=True, blank=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Price migration {self.product_id} -> {self.new_price_id} - {self.status}"
+
+
+class StripeRateLimit(models.Model):
+    """
+    Token bucket shared by every worker process to stay under the Stripe API rate limit.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    tokens = models.FloatField(default=0)
+    updated_date = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} - {self.tokens:.1f} tokens"
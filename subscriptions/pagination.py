@@ -0,0 +1,68 @@
+import base64
+import binascii
+from rest_framework import pagination
+
+
+class CustomPagination(pagination.PageNumberPagination):
+    """
+    A Custome Pagination for Search Filters
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CustomCursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination over an indexed ordering, with opaque cursors.
+
+    Every page is a `WHERE <ordering> > <cursor> LIMIT n` query, so page 500 costs the same as page 1.
+    Used instead of CustomPagination when the request asks for it (`?pagination=cursor`, then `?cursor=`).
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+
+def get_paginator(request, cursor_ordering):
+    """
+    Return the cursor paginator when the request asks for cursor pagination, CustomPagination otherwise.
+    """
+    if wants_cursor(request):
+        return CustomCursorPagination(cursor_ordering)
+    return CustomPagination()
+
+
+def wants_cursor(request):
+    """
+    Return True when the request asks for cursor pagination (`?pagination=cursor`, or a `?cursor=` of a later page).
+    """
+    return "cursor" in request.GET or request.GET.get("pagination") == "cursor"
+
+
+def encode_stripe_cursor(object_id):
+    """
+    Wrap a Stripe `starting_after` object ID in an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(f"after:{object_id}".encode()).decode()
+
+
+def decode_stripe_cursor(cursor):
+    """
+    Return the Stripe object ID of a cursor made by encode_stripe_cursor.
+
+    Raises:
+    - ValueError: The cursor is not a valid cursor.
+    """
+    try:
+        decoded = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+    prefix, _, object_id = decoded.partition(":")
+    if prefix != "after" or not object_id:
+        raise ValueError("Invalid cursor")
+    return object_id
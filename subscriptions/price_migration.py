@@ -0,0 +1,130 @@
+from datetime import timedelta
+import stripe
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .fanout import fetch_concurrently
+from .models import PriceMigrationJob
+
+PAGE_SIZE = 100
+
+
+def start_job(product_id, new_price_id):
+    """
+    Create a migration job for every other price of the product and return it (not started yet).
+    """
+    old_price_ids = [
+        price.id
+        for price in stripe.Price.list(product=product_id, limit=PAGE_SIZE).auto_paging_iter()
+        if price.id != new_price_id
+    ]
+
+    return PriceMigrationJob.objects.create(
+        product_id=product_id,
+        new_price_id=new_price_id,
+        old_price_ids=old_price_ids,
+        cursor={"price_index": 0, "starting_after": None},
+    )
+
+
+def resumable_jobs():
+    """
+    Return jobs waiting to start and running jobs that stopped making progress (their worker died).
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.PRICE_MIGRATION_STALE_AFTER)
+    return PriceMigrationJob.objects.filter(
+        Q(status="pending") | Q(status="running", modified_date__lt=stale_before)
+    ).order_by("id")
+
+
+def run_job(job_pk):
+    """
+    Claim a job and migrate its subscriptions, saving progress after every page.
+
+    Only subscriptions carrying one of the product's old prices are listed (`Subscription.list(price=...)`),
+    and the items of a page are modified concurrently with rate-limit backoff. Migrated subscriptions drop
+    out of the old price listing, so every page is read from the start of the listing; the cursor only
+    moves past subscriptions that failed to migrate.
+
+    Returns:
+    - bool: True when the job was claimed by this call.
+    """
+    claimed = resumable_jobs().filter(pk=job_pk).update(status="running", modified_date=timezone.now())
+    if not claimed:
+        return False
+
+    job = PriceMigrationJob.objects.get(pk=job_pk)
+    job.started_date = job.started_date or timezone.now()
+
+    try:
+        while job.cursor["price_index"] < len(job.old_price_ids):
+            if not _migrate_page(job, job.old_price_ids[job.cursor["price_index"]]):
+                job.cursor = {"price_index": job.cursor["price_index"] + 1, "starting_after": None}
+                job.save(update_fields=["cursor", "modified_date"])
+
+    except Exception as e:
+        job.status, job.last_error = "failed", str(e)
+
+    else:
+        job.status = "completed"
+
+    job.finished_date = timezone.now()
+    job.save()
+
+    return True
+
+
+def _migrate_page(job, old_price_id):
+    """
+    Migrate one page of subscriptions using `old_price_id`.
+
+    Returns:
+    - bool: True while more subscriptions may remain on this price.
+    """
+    params = {"price": old_price_id, "limit": PAGE_SIZE}
+    if job.cursor.get("starting_after"):
+        params["starting_after"] = job.cursor["starting_after"]
+
+    page = stripe.Subscription.list(**params)
+
+    failed = set(job.failed_subscription_ids)
+    updates = {
+        (subscription.id, item.id)
+        for subscription in page.data
+        if subscription.id not in failed
+        for item in subscription["items"]["data"]
+        if item["price"]["id"] == old_price_id
+    }
+
+    results = fetch_concurrently(lambda update: _modify(update, job.new_price_id), updates)
+
+    newly_failed = sorted({subscription_id for (subscription_id, _), ok in results.items() if not ok})
+    job.processed_count += len(results)
+    job.updated_count += sum(1 for ok in results.values() if ok)
+    job.failed_subscription_ids = job.failed_subscription_ids + newly_failed
+
+    # Only subscriptions that keep the old price can be used as a cursor
+    if not updates or newly_failed:
+        if page.data:
+            job.cursor = {"price_index": job.cursor["price_index"], "starting_after": page.data[-1].id}
+
+    job.save(update_fields=[
+        "cursor", "processed_count", "updated_count", "failed_subscription_ids", "modified_date",
+    ])
+
+    return page.has_more or bool(updates) and not newly_failed
+
+
+def _modify(update, new_price_id):
+    """
+    Move one subscription item to the new price.
+
+    Returns:
+    - bool: False when Stripe rejected the change (the job records it and moves on).
+    """
+    subscription_id, item_id = update
+    try:
+        stripe.Subscription.modify(subscription_id, items=[{"id": item_id, "price": new_price_id}])
+    except stripe.error.InvalidRequestError:
+        return False
+    return True
@@ -0,0 +1,75 @@
+import asyncio
+import stripe
+from django.conf import settings
+from .fanout import fetch_concurrently
+
+
+# Stripe caps list filters (`ids`) and page sizes at 100 entries
+STRIPE_LIST_LIMIT = 100
+
+
+def resolve_products(product_ids):
+    """
+    Fetch products together with their default prices in bulk.
+
+    Products are requested with `Product.list(ids=..., expand=["data.default_price"])`,
+    so resolving a cart costs one Stripe call per 100 products instead of a
+    Product.retrieve plus a Price.retrieve per product.
+
+    Args:
+    - product_ids (list): Stripe product IDs, duplicates and surrounding whitespace are ignored.
+
+    Returns:
+    - dict: product_id -> (product, default_price). `default_price` is None when the product
+      has no default price. Unknown product IDs are absent from the result.
+    """
+    unique_ids = list(dict.fromkeys(product_id.strip() for product_id in product_ids if product_id))
+
+    resolved = {}
+    for start in range(0, len(unique_ids), STRIPE_LIST_LIMIT):
+        products = stripe.Product.list(
+            ids=unique_ids[start:start + STRIPE_LIST_LIMIT],
+            limit=STRIPE_LIST_LIMIT,
+            expand=["data.default_price"],
+        )
+        for product in products.auto_paging_iter():
+            resolved[product.id] = (product, product.default_price or None)
+
+    return resolved
+
+
+def list_products():
+    """
+    Iterate over every product in the account together with its default price.
+
+    Yields:
+    - tuple: (product, default_price), `default_price` is None when unset.
+    """
+    products = stripe.Product.list(limit=STRIPE_LIST_LIMIT, expand=["data.default_price"])
+    for product in products.auto_paging_iter():
+        yield product, product.default_price or None
+
+
+def retrieve_products(product_ids):
+    """
+    Retrieve products concurrently, fetching each distinct ID once.
+
+    Returns:
+    - dict: product_id -> product.
+    """
+    return fetch_concurrently(stripe.Product.retrieve, product_ids)
+
+
+async def aretrieve_products(product_ids):
+    """
+    Async version of `retrieve_products()`, with at most STRIPE_FETCH_MAX_WORKERS calls in flight.
+    """
+    semaphore = asyncio.Semaphore(settings.STRIPE_FETCH_MAX_WORKERS)
+
+    async def retrieve(product_id):
+        async with semaphore:
+            return await stripe.Product.retrieve_async(product_id)
+
+    unique_ids = list(dict.fromkeys(product_ids))
+    products = await asyncio.gather(*(retrieve(product_id) for product_id in unique_ids))
+    return dict(zip(unique_ids, products))
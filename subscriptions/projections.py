@@ -0,0 +1,132 @@
+import threading
+
+# Kinds of compiled projection fields
+COPY, NESTED, MANY = 0, 1, 2
+
+# Distinct `fields=` selections kept compiled per projection
+MAX_CACHED_SELECTIONS = 256
+
+
+class ProjectionError(Exception):
+    """
+    Raised when a `fields=` selection names a field the projection does not have.
+    """
+
+
+class Many:
+    """
+    Marks a projection field holding a list of objects, each projected with `projection`.
+    """
+
+    def __init__(self, projection):
+        self.projection = projection
+
+
+class Projection:
+    """
+    Declarative mapping of a Stripe object (or any dict) to an API response shape.
+
+    Positional names are copied as they are, keyword fields hold a nested Projection, or Many(projection)
+    for lists. A selection is compiled once per distinct `fields=` value and reused by every request.
+
+    Example:
+        PRICE = Projection("id", "currency", "unit_amount")
+        ITEM = Projection("id", "quantity", price=PRICE)
+        ITEM.select("id,price.unit_amount").project(item)
+    """
+
+    def __init__(self, *names, **nested):
+        self.fields = dict.fromkeys(names)
+        self.fields.update(nested)
+        self._selections = {}
+        self._lock = threading.Lock()
+
+    def select(self, fields=None):
+        """
+        Return the compiled selection for a `fields=` query parameter.
+
+        Args:
+        - fields (str, optional): Comma separated dotted paths, e.g. "id,items.data.price.unit_amount".
+          Every field is selected when empty. Naming a nested field selects all of it.
+
+        Returns:
+        - Selection: The compiled selection.
+
+        Raises:
+        - ProjectionError: A path does not exist in the projection.
+        """
+        key = fields or ""
+        selection = self._selections.get(key)
+
+        if selection is None:
+            paths = [path.strip() for path in key.split(",") if path.strip()]
+            selection = Selection(_compile(self, _path_tree(paths), ""))
+            with self._lock:
+                if len(self._selections) < MAX_CACHED_SELECTIONS:
+                    self._selections[key] = selection
+
+        return selection
+
+
+class Selection:
+    """
+    A compiled projection, applying only the selected fields.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+
+    def project(self, obj):
+        return _apply(self.compiled, obj)
+
+    def project_many(self, objs):
+        compiled = self.compiled
+        return [_apply(compiled, obj) for obj in objs]
+
+
+def _path_tree(paths):
+    tree = {}
+    for path in paths:
+        node = tree
+        for name in path.split("."):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _compile(projection, tree, prefix):
+    unknown = [name for name in tree if name not in projection.fields]
+    if unknown:
+        raise ProjectionError(", ".join(prefix + name for name in unknown))
+
+    compiled = []
+    for name, child in projection.fields.items():
+        if tree and name not in tree:
+            continue
+        subtree = tree.get(name, {})
+
+        if child is None:
+            if subtree:
+                raise ProjectionError(", ".join(f"{prefix}{name}.{sub}" for sub in subtree))
+            compiled.append((name, COPY, None))
+        elif isinstance(child, Many):
+            compiled.append((name, MANY, _compile(child.projection, subtree, f"{prefix}{name}.")))
+        else:
+            compiled.append((name, NESTED, _compile(child, subtree, f"{prefix}{name}.")))
+
+    return tuple(compiled)
+
+
+def _apply(compiled, obj):
+    if obj is None:
+        return None
+
+    result = {}
+    for name, kind, child in compiled:
+        value = obj.get(name)
+        if kind == NESTED:
+            value = _apply(child, value)
+        elif kind == MANY and value is not None:
+            value = [_apply(child, element) for element in value]
+        result[name] = value
+
+    return result
@@ -0,0 +1,147 @@
+from collections import defaultdict
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from .models import ProductRevenue, StripeSubscriptionItem
+
+
+# Ended subscriptions do not count towards revenue, like the default Stripe Subscription.list
+EXCLUDED_STATUSES = ("canceled", "incomplete_expired")
+
+BUCKET_FIELDS = ("product_id", "year", "month", "currency", "state", "service")
+
+# Advisory lock on the whole rollup, after the sync.SUBSCRIPTION_LOCK / CUSTOMER_LOCK namespaces:
+# incremental updates share it, a rebuild takes it exclusively
+REVENUE_LOCK = 3
+
+
+def apply_changes(old_items, new_items):
+    """
+    Incrementally update the revenue rollup for a set of changed subscription items.
+
+    Waits for a running rebuild, whose snapshot of the mirror may not include these changes.
+
+    Args:
+    - old_items (list): StripeSubscriptionItem rows as stored before the change (removed items included).
+    - new_items (list): StripeSubscriptionItem rows as stored after the change.
+    """
+    deltas = defaultdict(int)
+    names = {}
+
+    for item in old_items:
+        bucket, amount = _contribution(item)
+        if bucket:
+            deltas[bucket] -= amount
+
+    for item in new_items:
+        bucket, amount = _contribution(item)
+        if bucket:
+            deltas[bucket] += amount
+            names[item.product_id] = item.product_name
+
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        _lock_rollup(exclusive=False)
+        for bucket, delta in deltas.items():
+            key = dict(zip(BUCKET_FIELDS, bucket))
+            updates = {"total_amount": F("total_amount") + delta}
+            if key["product_id"] in names:
+                updates["product_name"] = names[key["product_id"]]
+
+            if delta == 0 and "product_name" not in updates:
+                continue
+
+            if not ProductRevenue.objects.filter(**key).update(**updates):
+                try:
+                    with transaction.atomic():
+                        ProductRevenue.objects.create(product_name=names.get(key["product_id"]), total_amount=delta, **key)
+                except IntegrityError:
+                    # Created concurrently, add to the existing bucket instead
+                    ProductRevenue.objects.filter(**key).update(**updates)
+
+
+def rename_product(product_id, product_name):
+    """
+    Propagate a product rename to its revenue buckets.
+    """
+    with transaction.atomic():
+        _lock_rollup(exclusive=False)
+        ProductRevenue.objects.filter(product_id=product_id).exclude(product_name=product_name).update(
+            product_name=product_name
+        )
+
+
+def rebuild():
+    """
+    Recompute the whole revenue rollup from the subscription mirror with a single GROUP BY.
+
+    Incremental updates are held back until the new rollup is committed: those already
+    committed are in the GROUP BY, the others are applied on top of it afterwards.
+
+    Returns:
+    - int: Number of revenue buckets written.
+    """
+    with transaction.atomic():
+        _lock_rollup(exclusive=True)
+        rows = _aggregate()
+        ProductRevenue.objects.all().delete()
+        ProductRevenue.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+
+def _aggregate():
+    """
+    Return unsaved ProductRevenue rows for every bucket of the subscription mirror.
+    """
+    buckets = (
+        StripeSubscriptionItem.objects.exclude(status__in=EXCLUDED_STATUSES)
+        .annotate(year=ExtractYear("created"), month=ExtractMonth("created"))
+        .values("product_id", "year", "month", "currency", "state", "service")
+        .annotate(total_amount=Sum(F("unit_amount") * F("quantity")), product_name=Max("product_name"))
+        .order_by()
+    )
+
+    return [
+        ProductRevenue(
+            product_id=bucket["product_id"],
+            product_name=bucket["product_name"],
+            year=bucket["year"],
+            month=bucket["month"],
+            currency=bucket["currency"] or "",
+            state=bucket["state"],
+            service=bucket["service"],
+            total_amount=bucket["total_amount"] or 0,
+        )
+        for bucket in buckets.iterator()
+    ]
+
+
+def _lock_rollup(exclusive):
+    """
+    Take the rollup advisory lock until the end of the current transaction.
+    """
+    function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {function}(%s, 0)", [REVENUE_LOCK])
+
+
+def _contribution(item):
+    """
+    Return the (bucket, amount in cents) an item adds to the rollup, or (None, 0) if it does not count.
+    """
+    if item.status in EXCLUDED_STATUSES:
+        return None, 0
+
+    bucket = (
+        item.product_id,
+        item.created.year,
+        item.created.month,
+        item.currency or "",
+        item.state,
+        item.service,
+    )
+    return bucket, item.unit_amount * item.quantity
+
@@ -0,0 +1,77 @@
+import threading
+
+# Per-process coalescing counters, exposed by the Stripe client metrics API
+_metrics = {"executed": 0, "collapsed": 0, "wait_timeouts": 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(key):
+    with _metrics_lock:
+        _metrics[key] += 1
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls sharing a key into one: the first caller runs the function, the callers
+    arriving while it is in flight wait for it and get the same result (or exception).
+
+    Nothing is cached, a call arriving after the in-flight one finished runs again.
+
+    A waiting caller gives up after its `timeout` and runs the function itself, so a stuck call
+    never holds the others longer than they would have waited for their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            _count("collapsed")
+            if not call.done.wait(timeout):
+                _count("wait_timeouts")
+                return func()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        _count("executed")
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def get_metrics():
+    """
+    Return the coalescing counters of this process.
+
+    Returns:
+    - dict: Calls executed, calls collapsed into an in-flight one, collapsed calls that timed out
+      waiting and ran on their own, and the share of collapsed calls.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+
+    total = metrics["executed"] + metrics["collapsed"]
+    metrics["collapse_ratio"] = round(metrics["collapsed"] / total, 4) if total else None
+    return metrics
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+import stripe
+from django.conf import settings
+from . import breaker, stripe_client, tasks
+
+logger = logging.getLogger(__name__)
+
+# Stripe errors that say nothing about the request itself, the last good data is served instead
+UNAVAILABLE_ERRORS = (stripe.error.APIConnectionError, stripe.error.APIError, stripe.error.RateLimitError)
+
+# Header marking a response served from the last good data
+STALE_WARNING = '110 - "Response is Stale"'
+
+# Per-process LRU of key -> (last good value, stored at)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Keys being revalidated in the background
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+# Per-process counters, exposed by the Stripe client metrics API
+_metrics = {"fresh": 0, "stale": 0, "revalidations": 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(key):
+    with _metrics_lock:
+        _metrics[key] += 1
+
+
+def serve(key, fetch):
+    """
+    Return the result of a Stripe read, or its last good result when Stripe is unavailable.
+
+    While the circuit breaker is open the last good result is served right away and refreshed in
+    the background. Otherwise Stripe is called, within STRIPE_READ_TIMEOUT when there is a result
+    to fall back to, and the last good result is served if the call fails for reasons unrelated to
+    the request (connection errors, timeouts, 5xx, rate limits).
+
+    Args:
+    - key (hashable): Identifies the read, e.g. ("purchased_products", customer_id).
+    - fetch (callable): Function doing the Stripe read, its result must not be modified afterwards.
+
+    Returns:
+    - tuple: (result, stale), stale is True when the last good result was served.
+
+    Raises:
+    - stripe.error.StripeError: The read failed and there is no last good result.
+    """
+    cached = _get(key)
+
+    if cached is not None and breaker.is_open():
+        revalidate(key, lambda: _set(key, fetch()))
+        _count("stale")
+        return cached, True
+
+    try:
+        if cached is None:
+            value = fetch()
+        else:
+            with stripe_client.timeout(settings.STRIPE_READ_TIMEOUT):
+                value = fetch()
+    except UNAVAILABLE_ERRORS as e:
+        if cached is None:
+            raise
+        logger.warning("Serving stale %s: %s", key, e)
+        _count("stale")
+        return cached, True
+
+    _set(key, value)
+    _count("fresh")
+    return value, False
+
+
+def revalidate(key, func):
+    """
+    Run `func` on the background worker pool, unless it is already running for `key`.
+
+    Nothing is submitted while the circuit breaker is open, the refresh could only fail. Once it is
+    half-open the refresh may be the probe call that closes it again.
+    """
+    if breaker.state() == breaker.OPEN:
+        return
+
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+
+    def run():
+        try:
+            func()
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(key)
+
+    _count("revalidations")
+    try:
+        tasks.submit(run)
+    except RuntimeError:
+        # The worker pool is shutting down
+        with _revalidating_lock:
+            _revalidating.discard(key)
+
+
+def mark(response):
+    """
+    Mark a response as served from stale data.
+    """
+    response["Warning"] = STALE_WARNING
+    return response
+
+
+def _get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+
+        value, stored_at = entry
+        if time.monotonic() - stored_at > settings.STRIPE_STALE_MAX_AGE:
+            del _cache[key]
+            return None
+
+        _cache.move_to_end(key)
+        return value
+
+
+def _set(key, value):
+    with _cache_lock:
+        _cache[key] = (value, time.monotonic())
+        _cache.move_to_end(key)
+        while len(_cache) > settings.STRIPE_STALE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def get_metrics():
+    """
+    Return the stale serving counters of this process.
+
+    Returns:
+    - dict: Reads served fresh, reads served stale, background revalidations started.
+    """
+    with _metrics_lock:
+        return dict(_metrics)
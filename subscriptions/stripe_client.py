@@ -0,0 +1,223 @@
+import contextvars
+import socket
+import threading
+import time
+from contextlib import contextmanager
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from . import breaker, instrumentation, singleflight, throttle
+
+# Timeout override of the calls made inside a `timeout()` block, inherited by the fan-out threads
+_timeout_override = contextvars.ContextVar("stripe_timeout", default=None)
+
+# Concurrent identical GET requests share one call to Stripe
+_reads = singleflight.SingleFlight()
+
+# Request headers that change what a GET returns, part of the coalescing key with the URL
+READ_KEY_HEADERS = ("Authorization", "Stripe-Account", "Stripe-Version")
+
+# Per-process connection reuse counters, exposed by the Stripe client metrics API. Requests sent by
+# the async client are counted apart, httpx does not report the connections it opens
+_metrics = {"requests": 0, "connections_opened": 0, "async_requests": 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(key):
+    with _metrics_lock:
+        _metrics[key] += 1
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("connections_opened")
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("connections_opened")
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with TCP keep-alive enabled and a count of every new (TLS) connection it opens.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault(
+            "socket_options",
+            HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)],
+        )
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class TimeoutOverrideMixin:
+    """
+    Use the timeout of the enclosing `timeout()` block, if any, instead of the client's own.
+    """
+
+    @property
+    def _timeout(self):
+        return _timeout_override.get() or self._default_timeout
+
+    @_timeout.setter
+    def _timeout(self, value):
+        self._default_timeout = value
+
+
+class PooledRequestsClient(TimeoutOverrideMixin, stripe.RequestsClient):
+    """
+    Stripe HTTP client sharing one pooled requests.Session across all threads of the process.
+
+    Every request goes through the circuit breaker (see breaker.py), waits for a token of the shared
+    Stripe rate limit, and requests answered with 429 are retried with backoff before the error reaches the caller. The timeout can be overridden for
+    the calls made inside a `timeout()` block. Identical GET requests in flight at the same time are
+    sent once, the concurrent callers share its response.
+    """
+
+    def request(self, method, url, headers, post_data=None):
+        if method.lower() == "get":
+            key = (url,) + tuple((headers or {}).get(name) for name in READ_KEY_HEADERS)
+            # A caller waits for the shared call no longer than its own timeout, then sends its own request
+            return _reads.do(key, lambda: self._send(method, url, headers, post_data), timeout=self._wait_timeout())
+        return self._send(method, url, headers, post_data)
+
+    def _wait_timeout(self):
+        timeout = self._timeout
+        # A (connect, read) tuple bounds the request by the sum of both
+        return sum(timeout) if isinstance(timeout, tuple) else timeout
+
+    def _send(self, method, url, headers, post_data):
+        for attempt in range(settings.STRIPE_RATE_LIMIT_MAX_RETRIES + 1):
+            breaker.allow()
+            failed = True
+            started = time.perf_counter()
+            try:
+                throttle.acquire()
+                _count("requests")
+                started = time.perf_counter()
+                content, status_code, response_headers = super().request(method, url, headers, post_data)
+                failed = status_code >= 500
+            finally:
+                duration = time.perf_counter() - started
+                instrumentation.record_stripe_call(method, url, duration)
+                breaker.record(failed, duration)
+
+            if status_code != 429:
+                break
+
+            throttle.rate_limited()
+            if attempt < settings.STRIPE_RATE_LIMIT_MAX_RETRIES:
+                throttle.retry_after(attempt, response_headers)
+
+        return content, status_code, response_headers
+
+
+class ThrottledHTTPXClient(TimeoutOverrideMixin, stripe.HTTPXClient):
+    """
+    Stripe HTTP client of the *_async methods (the async views).
+
+    Requests go through the same circuit breaker, shared rate limit, 429 retries and per-request
+    metrics as PooledRequestsClient. The rate limit is waited for on the event loop. GET requests
+    are not coalesced, the single-flight map is shared between threads, not between coroutines.
+    """
+
+    async def request_async(self, method, url, headers, post_data=None):
+        for attempt in range(settings.STRIPE_RATE_LIMIT_MAX_RETRIES + 1):
+            breaker.allow()
+            failed = True
+            started = time.perf_counter()
+            try:
+                await throttle.aacquire()
+                _count("async_requests")
+                started = time.perf_counter()
+                content, status_code, response_headers = await super().request_async(method, url, headers, post_data)
+                failed = status_code >= 500
+            finally:
+                duration = time.perf_counter() - started
+                instrumentation.record_stripe_call(method, url, duration)
+                breaker.record(failed, duration)
+
+            if status_code != 429:
+                break
+
+            throttle.rate_limited()
+            if attempt < settings.STRIPE_RATE_LIMIT_MAX_RETRIES:
+                await throttle.aretry_after(attempt, response_headers)
+
+        return content, status_code, response_headers
+
+
+def build_session():
+    """
+    Build the requests.Session used for every Stripe call.
+    """
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(
+        pool_connections=settings.STRIPE_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def configure():
+    """
+    Configure the stripe library with the API key and the pooled HTTP client (once per process).
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+
+    if not isinstance(stripe.default_http_client, PooledRequestsClient):
+        stripe.default_http_client = PooledRequestsClient(
+            timeout=(settings.STRIPE_HTTP_CONNECT_TIMEOUT, settings.STRIPE_HTTP_TIMEOUT),
+            session=build_session(),
+            # Used by the *_async methods of the async views, httpx pools its connections too
+            async_fallback_client=ThrottledHTTPXClient(timeout=settings.STRIPE_HTTP_TIMEOUT),
+        )
+
+
+@contextmanager
+def timeout(seconds):
+    """
+    Use a different timeout for the Stripe calls made inside the block, fan-out calls included.
+
+    Example:
+        with stripe_client.timeout(5):
+            stripe.Product.retrieve(product_id)
+    """
+    token = _timeout_override.set(seconds)
+    try:
+        yield
+    finally:
+        _timeout_override.reset(token)
+
+
+def get_metrics():
+    """
+    Return the connection reuse counters of this process.
+
+    Returns:
+    - dict: Requests sent, connections opened, requests served on a reused connection, the reuse ratio,
+      requests sent by the async client, the rate limit throttling counters, the GET coalescing counters and the circuit breaker state.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+
+    metrics["connections_reused"] = max(metrics["requests"] - metrics["connections_opened"], 0)
+    metrics["reuse_ratio"] = (
+        round(metrics["connections_reused"] / metrics["requests"], 4) if metrics["requests"] else None
+    )
+    metrics["throttle"] = throttle.get_metrics()
+    metrics["singleflight"] = singleflight.get_metrics()
+    metrics["breaker"] = breaker.get_metrics()
+    return metrics
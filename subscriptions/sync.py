@@ -0,0 +1,356 @@
+from datetime import datetime, timezone as dt_timezone
+import stripe
+from django.db import connection, transaction
+from django.utils import timezone
+from . import customers as customer_links, revenue
+from .models import StripeCustomer, StripeProduct, StripeSubscriptionItem, Subscription, Users
+from .products import resolve_products
+
+
+# Webhook events that keep the local customer/subscription mirror in sync with Stripe
+CUSTOMER_EVENTS = ("customer.created", "customer.updated", "customer.deleted")
+SUBSCRIPTION_EVENTS = (
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+    "customer.subscription.paused",
+    "customer.subscription.resumed",
+)
+
+# Stripe subscription statuses that end a local Subscription row
+CANCELED_STATUSES = ("canceled", "incomplete_expired")
+
+CUSTOMER_FIELDS = ["email", "name", "user", "created", "is_active", "event_created", "modified_date"]
+ITEM_FIELDS = [
+    "subscription_id", "customer", "status", "product_id", "product_name", "price_id", "unit_amount",
+    "currency", "quantity", "interval", "created", "trial_end", "canceled_at", "ended_at", "current_period_end",
+    "state", "service", "event_created", "modified_date",
+]
+
+# Product metadata key holding the service a product belongs to, used for revenue reporting
+SERVICE_METADATA_KEY = "service"
+
+BATCH_SIZE = 100
+
+# Namespaces (first key) of the advisory locks taken on Stripe objects, see _lock_objects
+SUBSCRIPTION_LOCK = 1
+CUSTOMER_LOCK = 2
+
+LOCK_SQL = "SELECT pg_advisory_xact_lock(%s, hashtext(object_id)) FROM unnest(%s::text[]) AS object_id"
+
+
+def sync_all():
+    """
+    Mirror every Stripe customer, subscription and subscription item into the local tables.
+
+    Rows that were not seen during the run (deleted in Stripe) are removed afterwards.
+
+    Returns:
+    - dict: Number of customers and subscriptions synced.
+    """
+    started = timezone.now()
+    counts = {"customers": 0, "subscriptions": 0}
+
+    batch = []
+    for customer in stripe.Customer.list(limit=BATCH_SIZE).auto_paging_iter():
+        batch.append(customer)
+        if len(batch) >= BATCH_SIZE:
+            counts["customers"] += len(sync_customers(batch))
+            batch = []
+    if batch:
+        counts["customers"] += len(sync_customers(batch))
+
+    batch = []
+    for subscription in stripe.Subscription.list(limit=BATCH_SIZE, status="all").auto_paging_iter():
+        batch.append(subscription)
+        if len(batch) >= BATCH_SIZE:
+            sync_subscriptions(batch)
+            counts["subscriptions"] += len(batch)
+            batch = []
+    if batch:
+        sync_subscriptions(batch)
+        counts["subscriptions"] += len(batch)
+
+    StripeSubscriptionItem.objects.filter(modified_date__lt=started).delete()
+    StripeCustomer.objects.filter(modified_date__lt=started).delete()
+    revenue.rebuild()
+
+    return counts
+
+
+def sync_customers(customers, version=None):
+    """
+    Upsert Stripe customers into StripeCustomer, linking them to local users by email.
+
+    Args:
+    - customers (list): Stripe customers.
+    - version (datetime, optional): When the payloads were current (event creation time), defaults to now.
+      Customers already stored from a later version are left as they are.
+
+    Returns:
+    - dict: customer_id -> StripeCustomer.
+    """
+    emails = {customer.get("email") for customer in customers if customer.get("email")}
+    users = {user.email: user for user in Users.objects.filter(email__in=emails)}
+
+    now = timezone.now()
+    version = version or now
+    rows = [
+        StripeCustomer(
+            customer_id=customer["id"],
+            email=customer.get("email"),
+            name=customer.get("name"),
+            user=users.get(customer.get("email")),
+            created=_from_timestamp(customer.get("created")),
+            is_active=True,
+            event_created=version,
+            modified_date=now,
+        )
+        for customer in customers
+    ]
+
+    with transaction.atomic():
+        _lock_objects(CUSTOMER_LOCK, [row.customer_id for row in rows])
+        newer = set(
+            StripeCustomer.objects.filter(
+                customer_id__in=[row.customer_id for row in rows], event_created__gt=version
+            ).values_list("customer_id", flat=True)
+        )
+        StripeCustomer.objects.bulk_create(
+            [row for row in rows if row.customer_id not in newer],
+            update_conflicts=True,
+            unique_fields=["customer_id"],
+            update_fields=CUSTOMER_FIELDS,
+        )
+
+    # Customers are listed newest first, keep the first customer of each email like a Stripe search would
+    customer_links.link_by_email({
+        row.email: row.customer_id for row in reversed(rows) if row.user is not None
+    })
+
+    return {
+        row.customer_id: row
+        for row in StripeCustomer.objects.select_related("user").filter(customer_id__in=[row.customer_id for row in rows])
+    }
+
+
+def sync_subscriptions(subscriptions, version=None):
+    """
+    Upsert the items of the given Stripe subscriptions into StripeSubscriptionItem.
+
+    Customers, product names and existing rows are loaded in bulk, so a page of subscriptions costs a
+    fixed number of queries. Canceled subscriptions are also propagated to the local Subscription table
+    and the revenue rollup is adjusted by the difference between the old and new items.
+
+    Stripe events arrive, and are processed, out of order: subscriptions already stored from a later
+    `version` (event creation time, defaults to now) are left as they are.
+    """
+    customer_ids = {_object_id(subscription["customer"]) for subscription in subscriptions}
+    customers = _ensure_customers(customer_ids)
+    # Subscriptions of deleted customers are not mirrored
+    subscriptions = [
+        subscription for subscription in subscriptions if _object_id(subscription["customer"]) in customers
+    ]
+
+    product_ids = {
+        item["price"]["product"]
+        for subscription in subscriptions
+        for item in subscription["items"]["data"]
+    }
+    products = _product_details(product_ids)
+
+    now = timezone.now()
+    version = version or now
+    rows = []
+    for subscription in subscriptions:
+        for item in subscription["items"]["data"]:
+            price = item["price"]
+            recurring = price.get("recurring") or {}
+            product_name, service = products.get(price["product"], (None, ""))
+            customer = customers[_object_id(subscription["customer"])]
+            rows.append(StripeSubscriptionItem(
+                item_id=item["id"],
+                subscription_id=subscription["id"],
+                customer=customer,
+                status=subscription["status"],
+                product_id=price["product"],
+                product_name=product_name,
+                price_id=price["id"],
+                unit_amount=price.get("unit_amount") or 0,
+                currency=price.get("currency"),
+                quantity=item.get("quantity") or 1,
+                interval=recurring.get("interval"),
+                created=_from_timestamp(subscription["created"]),
+                trial_end=_from_timestamp(subscription.get("trial_end")),
+                canceled_at=_from_timestamp(subscription.get("canceled_at")),
+                ended_at=_from_timestamp(subscription.get("ended_at")),
+                current_period_end=_from_timestamp(subscription.get("current_period_end")),
+                state=(customer.user.state or "") if customer.user else "",
+                service=service,
+                event_created=version,
+                modified_date=now,
+            ))
+
+    subscription_ids = [subscription["id"] for subscription in subscriptions]
+    canceled_ids = [
+        subscription["id"] for subscription in subscriptions if subscription["status"] in CANCELED_STATUSES
+    ]
+
+    with transaction.atomic():
+        # A subscription seen for the first time has no rows to lock yet, concurrent workers are
+        # serialized by subscription instead so only one of them counts its items as new revenue
+        _lock_objects(SUBSCRIPTION_LOCK, subscription_ids)
+        old_rows = list(StripeSubscriptionItem.objects.filter(subscription_id__in=subscription_ids))
+
+        newer = {row.subscription_id for row in old_rows if row.event_created and row.event_created > version}
+        if newer:
+            old_rows = [row for row in old_rows if row.subscription_id not in newer]
+            rows = [row for row in rows if row.subscription_id not in newer]
+            subscription_ids = [subscription_id for subscription_id in subscription_ids if subscription_id not in newer]
+            canceled_ids = [subscription_id for subscription_id in canceled_ids if subscription_id not in newer]
+
+        StripeSubscriptionItem.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["item_id"],
+            update_fields=ITEM_FIELDS,
+        )
+        # Items removed from a subscription
+        StripeSubscriptionItem.objects.filter(subscription_id__in=subscription_ids).exclude(
+            item_id__in=[row.item_id for row in rows]
+        ).delete()
+
+        if canceled_ids:
+            Subscription.objects.filter(stripe_subscription_id__in=canceled_ids).update(payment_status="canceled")
+
+        revenue.apply_changes(old_rows, rows)
+
+    return rows
+
+
+def handle_customer_event(event_type, customer, event_created=None):
+    """
+    Apply a customer.* webhook event to the local mirror.
+
+    Args:
+    - event_type (str): The Stripe event type.
+    - customer (dict): The customer of the event.
+    - event_created (int, optional): Creation time of the event (Unix timestamp), older payloads are skipped.
+    """
+    if event_type == "customer.deleted":
+        with transaction.atomic():
+            _lock_objects(
+                SUBSCRIPTION_LOCK,
+                StripeSubscriptionItem.objects.filter(customer__customer_id=customer["id"]).values_list(
+                    "subscription_id", flat=True
+                ),
+            )
+            items = list(StripeSubscriptionItem.objects.filter(customer__customer_id=customer["id"]))
+            StripeCustomer.objects.filter(customer_id=customer["id"]).delete()
+            revenue.apply_changes(items, [])
+            customer_links.unlink(customer["id"])
+    else:
+        # A late created/updated event must not bring back a customer that was deleted since
+        if not StripeCustomer.objects.filter(customer_id=customer["id"]).exists():
+            if stripe.Customer.retrieve(customer["id"]).get("deleted"):
+                return
+        sync_customers([customer], version=_from_timestamp(event_created))
+
+
+def handle_subscription_event(event_type, subscription, event_created=None):
+    """
+    Apply a customer.subscription.* webhook event to the local mirror.
+
+    Args:
+    - event_type (str): The Stripe event type.
+    - subscription (dict): The subscription of the event.
+    - event_created (int, optional): Creation time of the event (Unix timestamp), older payloads are skipped.
+    """
+    sync_subscriptions([subscription], version=_from_timestamp(event_created))
+
+
+def handle_product_event(event_type, product):
+    """
+    Keep the denormalized product names of mirrored subscription items and revenue buckets up to date.
+    """
+    if event_type != "product.deleted":
+        StripeSubscriptionItem.objects.filter(product_id=product["id"]).exclude(
+            product_name=product.get("name")
+        ).update(product_name=product.get("name"))
+        revenue.rename_product(product["id"], product.get("name"))
+
+
+def _ensure_customers(customer_ids):
+    """
+    Return StripeCustomer rows for the given IDs, fetching unknown customers from Stripe (deleted ones are left out).
+    """
+    customers = {
+        row.customer_id: row
+        for row in StripeCustomer.objects.select_related("user").filter(customer_id__in=customer_ids)
+    }
+
+    missing = [stripe.Customer.retrieve(customer_id) for customer_id in customer_ids if customer_id not in customers]
+    missing = [customer for customer in missing if not customer.get("deleted")]
+    if missing:
+        customers.update(sync_customers(missing))
+
+    return customers
+
+
+def _product_details(product_ids):
+    """
+    Map product IDs to (name, service) from the local catalog, falling back to one bulk Stripe lookup.
+    """
+    details = {
+        product_id: (name, (metadata or {}).get(SERVICE_METADATA_KEY, ""))
+        for product_id, name, metadata in StripeProduct.objects.filter(product_id__in=product_ids).values_list(
+            "product_id", "name", "metadata"
+        )
+    }
+
+    missing = [product_id for product_id in product_ids if product_id not in details]
+    if missing:
+        for product_id, (product, price) in resolve_products(missing).items():
+            details[product_id] = (product.get("name"), (product.get("metadata") or {}).get(SERVICE_METADATA_KEY, ""))
+
+    return details
+
+
+def lock_subscriptions(subscription_ids):
+    """
+    Serialize the writers of the given subscriptions until the end of the current transaction.
+    """
+    _lock_objects(SUBSCRIPTION_LOCK, subscription_ids)
+
+
+def is_canceled(subscription_id):
+    """
+    Return True when the mirrored subscription has ended.
+    """
+    return StripeSubscriptionItem.objects.filter(subscription_id=subscription_id, status__in=CANCELED_STATUSES).exists()
+
+
+def _lock_objects(namespace, object_ids):
+    """
+    Take a transaction-level advisory lock on each Stripe object, in a fixed order to avoid deadlocks.
+    """
+    object_ids = sorted(set(object_ids))
+    if object_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_SQL, [namespace, object_ids])
+
+
+def _object_id(value):
+    """
+    Return the ID of a Stripe reference that may or may not be expanded.
+    """
+    return value if isinstance(value, str) else value["id"]
+
+
+def _from_timestamp(value):
+    """
+    Convert a Stripe Unix timestamp into an aware datetime.
+    """
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
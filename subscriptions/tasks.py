@@ -0,0 +1,68 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from .breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Background worker pools: name (thread name prefix) -> setting holding its number of threads.
+# Price migrations run for minutes, they get their own pool so webhooks and revalidations never queue behind them
+WORKER_POOL = "stripe-worker"
+PRICE_MIGRATION_POOL = "price-migration"
+POOL_SIZES = {
+    WORKER_POOL: "STRIPE_WEBHOOK_WORKERS",
+    PRICE_MIGRATION_POOL: "PRICE_MIGRATION_WORKERS",
+}
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def get_executor(pool=WORKER_POOL):
+    """
+    Return a process-wide background worker pool, sized by its POOL_SIZES setting.
+    """
+    executor = _executors.get(pool)
+
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                executor = _executors[pool] = ThreadPoolExecutor(
+                    max_workers=getattr(settings, POOL_SIZES[pool]),
+                    thread_name_prefix=pool,
+                )
+    return executor
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run `func` on the background worker pool (webhook events, revalidations).
+    """
+    return submit_to(WORKER_POOL, func, *args, **kwargs)
+
+
+def submit_to(pool, func, *args, **kwargs):
+    """
+    Run `func` on the given background worker pool.
+
+    Each task gets a fresh view of the database connections, like a request would, so worker
+    threads never reuse a connection that was closed or broken in the meantime.
+    """
+    def run():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        except CircuitOpenError as e:
+            # Expected while Stripe is unavailable, not worth a traceback per task
+            logger.warning("Background task %s skipped: %s", getattr(func, "__name__", func), e)
+            raise
+        except Exception:
+            logger.exception("Background task %s failed", getattr(func, "__name__", func))
+            raise
+        finally:
+            close_old_connections()
+
+    return get_executor(pool).submit(run)
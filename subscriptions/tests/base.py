@@ -0,0 +1,43 @@
+from datetime import datetime, timezone as dt_timezone
+from django.test import TestCase
+from ..models import ProductRevenue, StripeCustomer, StripeProduct
+
+
+def timestamp(year, month, day):
+    return int(datetime(year, month, day, tzinfo=dt_timezone.utc).timestamp())
+
+
+def date(year, month, day):
+    return datetime(year, month, day, tzinfo=dt_timezone.utc)
+
+
+class MirrorTestCase(TestCase):
+    """
+    Mirror rows that let the sync code run without calling Stripe.
+    """
+
+    def setUp(self):
+        self.customer = StripeCustomer.objects.create(customer_id="cus_1", email="jane@example.com", name="Jane")
+        StripeProduct.objects.create(product_id="prod_1", name="Plan", metadata={"service": "video"})
+
+    def subscription(self, status="active", quantity=1, unit_amount=1000, created=(2024, 1, 10), **fields):
+        return dict({
+            "id": "sub_1",
+            "customer": "cus_1",
+            "status": status,
+            "created": timestamp(*created),
+            "items": {"data": [{
+                "id": "si_1",
+                "quantity": quantity,
+                "price": {
+                    "id": "price_1",
+                    "product": "prod_1",
+                    "unit_amount": unit_amount,
+                    "currency": "usd",
+                    "recurring": {"interval": "month"},
+                },
+            }]},
+        }, **fields)
+
+    def revenue_total(self):
+        return sum(ProductRevenue.objects.values_list("total_amount", flat=True))
@@ -0,0 +1,71 @@
+from unittest import mock
+import pandas as pd
+from django.test import TestCase, override_settings
+from .. import analytics
+from ..models import StripeCustomer, StripeSubscriptionItem
+from .base import date
+
+
+@override_settings(ANALYTICS_CACHE_TTL=-1)
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.customer = StripeCustomer.objects.create(customer_id="cus_1", name="Jane")
+        analytics._frame = None
+        self.addCleanup(setattr, analytics, "_frame", None)
+
+        patcher = mock.patch("subscriptions.analytics._now", return_value=pd.Timestamp("2024-06-05"))
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def item(self, item_id, **fields):
+        return StripeSubscriptionItem.objects.create(**dict({
+            "item_id": item_id,
+            "subscription_id": item_id.replace("si", "sub"),
+            "customer": self.customer,
+            "status": "active",
+            "product_id": "prod_1",
+            "product_name": "Plan",
+            "unit_amount": 1000,
+            "currency": "usd",
+            "quantity": 1,
+            "interval": "month",
+            "created": date(2024, 1, 10),
+        }, **fields))
+
+    def test_mrr_keeps_subscriptions_canceled_at_period_end(self):
+        self.item("si_1", canceled_at=date(2024, 5, 20), current_period_end=date(2024, 6, 10))
+        self.item("si_2", unit_amount=12000, interval="year")
+        self.item("si_3", status="canceled", canceled_at=date(2024, 3, 3), ended_at=date(2024, 4, 1))
+
+        [usd] = analytics.mrr(months=6)
+        self.assertEqual(usd["mrr"], 20.0)
+        self.assertEqual([month["mrr"] for month in usd["history"]], [30.0, 30.0, 30.0, 20.0, 20.0, 20.0])
+
+    def test_churn_counts_the_month_billing_ended(self):
+        self.item("si_1", canceled_at=date(2024, 5, 20), current_period_end=date(2024, 6, 10))
+        self.item("si_2", status="canceled", canceled_at=date(2024, 3, 3), ended_at=date(2024, 4, 1))
+
+        churn = {row["month"]: row for row in analytics.churn(months=6)}
+        self.assertEqual(churn["2024-03"]["churned"], 0)
+        self.assertEqual(churn["2024-04"]["churned"], 1)
+        self.assertEqual(churn["2024-04"]["churn_rate"], 0.5)
+        self.assertEqual(churn["2024-05"]["churned"], 0)
+
+    def test_trial_conversion(self):
+        self.item("si_1", trial_end=date(2024, 2, 10))
+        self.item(
+            "si_2", trial_end=date(2024, 2, 10), status="canceled", canceled_at=date(2024, 2, 1), ended_at=date(2024, 2, 10)
+        )
+
+        february = {row["month"]: row for row in analytics.trial_conversion(months=6)}["2024-02"]
+        self.assertEqual((february["trials_ended"], february["converted"]), (2, 1))
+
+    def test_cohorts(self):
+        self.item("si_1")
+        other = StripeCustomer.objects.create(customer_id="cus_2", name="John")
+        self.item("si_2", customer=other, status="canceled", canceled_at=date(2024, 3, 15), ended_at=date(2024, 3, 15))
+
+        [january] = analytics.cohorts(months=6)
+        self.assertEqual(january["cohort"], "2024-01")
+        self.assertEqual(january["customers"], 2)
+        self.assertEqual(january["retention"], [1.0, 1.0, 0.5, 0.5, 0.5, 0.5])
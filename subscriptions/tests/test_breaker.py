@@ -0,0 +1,70 @@
+from unittest import mock
+import stripe
+from django.test import SimpleTestCase, override_settings
+from .. import breaker
+
+
+@override_settings(
+    STRIPE_BREAKER_WINDOW=30,
+    STRIPE_BREAKER_MIN_CALLS=4,
+    STRIPE_BREAKER_ERROR_RATE=0.5,
+    STRIPE_BREAKER_SLOW_CALL=1,
+    STRIPE_BREAKER_SLOW_RATE=0.5,
+    STRIPE_BREAKER_OPEN_SECONDS=30,
+)
+class BreakerTests(SimpleTestCase):
+    def setUp(self):
+        breaker._state, breaker._probing = breaker.CLOSED, False
+        breaker._calls.clear()
+
+        self.now = 1000.0
+        patcher = mock.patch("subscriptions.breaker.time")
+        self.addCleanup(patcher.stop)
+        patcher.start().monotonic.side_effect = lambda: self.now
+
+    def record(self, *outcomes, duration=0.1):
+        for failed in outcomes:
+            breaker.allow()
+            breaker.record(failed, duration)
+
+    def test_stays_closed_below_min_calls(self):
+        self.record(True, True, True)
+        self.assertEqual(breaker.state(), breaker.CLOSED)
+
+    def test_opens_on_error_rate(self):
+        self.record(False, True, False, True)
+        self.assertEqual(breaker.state(), breaker.OPEN)
+        with self.assertRaises(breaker.CircuitOpenError):
+            breaker.allow()
+
+    def test_opens_on_slow_calls(self):
+        self.record(False, False, duration=0.1)
+        self.record(False, False, duration=2)
+        self.assertEqual(breaker.state(), breaker.OPEN)
+
+    def test_old_calls_leave_the_window(self):
+        self.record(True, True, True)
+        self.now += 31
+        self.record(False)
+        self.assertEqual(breaker.state(), breaker.CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.record(True, True, True, True)
+        self.now += 30
+        self.assertEqual(breaker.state(), breaker.HALF_OPEN)
+
+        breaker.allow()
+        with self.assertRaises(breaker.CircuitOpenError):
+            breaker.allow()
+
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state(), breaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        self.record(True, True, True, True)
+        self.now += 30
+        self.record(True)
+        self.assertEqual(breaker.state(), breaker.OPEN)
+
+    def test_open_error_is_a_stripe_error(self):
+        self.assertTrue(issubclass(breaker.CircuitOpenError, stripe.error.StripeError))
@@ -0,0 +1,12 @@
+from django.test import SimpleTestCase
+from ..pagination import decode_stripe_cursor, encode_stripe_cursor
+
+
+class StripeCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_stripe_cursor(encode_stripe_cursor("sub_123")), "sub_123")
+
+    def test_invalid_cursors(self):
+        for cursor in ["not base64!", "c3ViXzEyMw==", encode_stripe_cursor("")]:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_stripe_cursor(cursor)
@@ -0,0 +1,47 @@
+from django.test import SimpleTestCase
+from ..projections import Many, Projection, ProjectionError
+
+
+class ProjectionTests(SimpleTestCase):
+    PRICE = Projection("id", "unit_amount")
+    ITEM = Projection("id", "quantity", price=PRICE)
+    SUBSCRIPTION = Projection("id", "status", items=Projection("total_count", data=Many(ITEM)))
+
+    subscription = {
+        "id": "sub_1",
+        "status": "active",
+        "extra": "dropped",
+        "items": {
+            "total_count": 1,
+            "data": [{"id": "si_1", "quantity": 2, "price": {"id": "price_1", "unit_amount": 500, "currency": "usd"}}],
+        },
+    }
+
+    def test_every_field_by_default(self):
+        self.assertEqual(self.SUBSCRIPTION.select().project(self.subscription), {
+            "id": "sub_1",
+            "status": "active",
+            "items": {
+                "total_count": 1,
+                "data": [{"id": "si_1", "quantity": 2, "price": {"id": "price_1", "unit_amount": 500}}],
+            },
+        })
+
+    def test_nested_selection(self):
+        selection = self.SUBSCRIPTION.select("id, items.data.price.unit_amount")
+        self.assertEqual(selection.project(self.subscription), {
+            "id": "sub_1",
+            "items": {"data": [{"price": {"unit_amount": 500}}]},
+        })
+
+    def test_missing_values(self):
+        self.assertEqual(self.ITEM.select("id,price").project({"id": "si_1"}), {"id": "si_1", "price": None})
+
+    def test_unknown_fields(self):
+        with self.assertRaisesMessage(ProjectionError, "items.data.nope"):
+            self.SUBSCRIPTION.select("items.data.nope")
+        with self.assertRaisesMessage(ProjectionError, "status.value"):
+            self.SUBSCRIPTION.select("status.value")
+
+    def test_selections_are_compiled_once(self):
+        self.assertIs(self.ITEM.select("id"), self.ITEM.select("id"))
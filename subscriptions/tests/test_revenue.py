@@ -0,0 +1,48 @@
+from .. import revenue, sync
+from ..models import ProductRevenue, StripeSubscriptionItem
+from .base import MirrorTestCase, date
+
+
+class RevenueDeltaTests(MirrorTestCase):
+    def item(self, **fields):
+        return StripeSubscriptionItem(**dict({
+            "item_id": "si_1",
+            "subscription_id": "sub_1",
+            "customer": self.customer,
+            "status": "active",
+            "product_id": "prod_1",
+            "product_name": "Plan",
+            "unit_amount": 1000,
+            "currency": "usd",
+            "quantity": 1,
+            "created": date(2024, 1, 10),
+            "state": "CA",
+            "service": "video",
+        }, **fields))
+
+    def test_new_item(self):
+        revenue.apply_changes([], [self.item()])
+
+        bucket = ProductRevenue.objects.get()
+        self.assertEqual((bucket.year, bucket.month, bucket.total_amount), (2024, 1, 1000))
+
+    def test_changed_quantity_applies_the_difference(self):
+        revenue.apply_changes([], [self.item()])
+        revenue.apply_changes([self.item()], [self.item(quantity=3)])
+        self.assertEqual(self.revenue_total(), 3000)
+
+    def test_canceled_item_is_removed(self):
+        revenue.apply_changes([], [self.item()])
+        revenue.apply_changes([self.item()], [self.item(status="canceled")])
+        self.assertEqual(self.revenue_total(), 0)
+
+    def test_items_of_the_same_bucket_add_up(self):
+        revenue.apply_changes([], [self.item(), self.item(item_id="si_2", unit_amount=500)])
+        self.assertEqual(ProductRevenue.objects.get().total_amount, 1500)
+
+    def test_rebuild_matches_incremental_updates(self):
+        sync.sync_subscriptions([self.subscription(quantity=2)])
+        incremental = self.revenue_total()
+
+        revenue.rebuild()
+        self.assertEqual(self.revenue_total(), incremental)
@@ -0,0 +1,66 @@
+import threading
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from .. import singleflight
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = singleflight.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        results = []
+        collapsed = singleflight.get_metrics()["collapsed"]
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+        leader.start()
+        started.wait(5)
+
+        followers = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        # Release the call once every follower is waiting on it
+        for _ in range(500):
+            if singleflight.get_metrics()["collapsed"] - collapsed >= 3:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 4)
+
+    def test_errors_are_shared_and_not_kept(self):
+        flight = singleflight.SingleFlight()
+
+        with self.assertRaises(ValueError):
+            flight.do("key", mock.Mock(side_effect=ValueError))
+        self.assertEqual(flight.do("key", lambda: "again"), "again")
+        self.assertEqual(flight._calls, {})
+
+    def test_waiting_caller_runs_its_own_call_after_its_timeout(self):
+        flight = singleflight.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def stuck():
+            started.set()
+            release.wait(5)
+            return "late"
+
+        leader = threading.Thread(target=flight.do, args=("key", stuck))
+        leader.start()
+        self.addCleanup(leader.join, 5)
+        self.addCleanup(release.set)
+        started.wait(5)
+
+        timeouts = singleflight.get_metrics()["wait_timeouts"]
+        self.assertEqual(flight.do("key", lambda: "own", timeout=0.05), "own")
+        self.assertEqual(singleflight.get_metrics()["wait_timeouts"] - timeouts, 1)
@@ -0,0 +1,42 @@
+from unittest import mock
+from .. import sync
+from ..listings import subscription_items
+from ..models import StripeCustomer, StripeSubscriptionItem
+from .base import MirrorTestCase, timestamp
+
+
+class SubscriptionEventOrderTests(MirrorTestCase):
+    def test_created_then_updated_counts_once(self):
+        sync.handle_subscription_event("customer.subscription.created", self.subscription(), timestamp(2024, 1, 10))
+        sync.handle_subscription_event(
+            "customer.subscription.updated", self.subscription(quantity=2), timestamp(2024, 1, 11)
+        )
+        self.assertEqual(self.revenue_total(), 2000)
+
+    def test_late_update_does_not_undo_a_cancellation(self):
+        sync.handle_subscription_event("customer.subscription.created", self.subscription(), timestamp(2024, 1, 10))
+        sync.handle_subscription_event(
+            "customer.subscription.deleted", self.subscription(status="canceled"), timestamp(2024, 3, 1)
+        )
+        sync.handle_subscription_event(
+            "customer.subscription.updated", self.subscription(quantity=2), timestamp(2024, 2, 1)
+        )
+
+        item = StripeSubscriptionItem.objects.get()
+        self.assertEqual((item.status, item.quantity), ("canceled", 1))
+        self.assertEqual(self.revenue_total(), 0)
+        self.assertTrue(sync.is_canceled("sub_1"))
+
+    def test_late_customer_update_is_skipped(self):
+        sync.handle_customer_event("customer.updated", {"id": "cus_1", "name": "New"}, timestamp(2024, 2, 1))
+        sync.handle_customer_event("customer.updated", {"id": "cus_1", "name": "Old"}, timestamp(2024, 1, 1))
+        self.assertEqual(StripeCustomer.objects.get().name, "New")
+
+    @mock.patch("subscriptions.sync.stripe.Customer.retrieve", return_value={"id": "cus_2", "deleted": True})
+    def test_deleted_customer_is_not_brought_back(self, retrieve):
+        sync.handle_customer_event("customer.updated", {"id": "cus_2", "name": "Gone"}, timestamp(2024, 1, 1))
+        self.assertFalse(StripeCustomer.objects.filter(customer_id="cus_2").exists())
+
+    def test_ended_subscriptions_are_not_listed(self):
+        sync.sync_subscriptions([self.subscription(status="canceled")])
+        self.assertFalse(subscription_items().exists())
@@ -0,0 +1,46 @@
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from .. import throttle
+
+
+@override_settings(STRIPE_RATE_LIMIT=10, STRIPE_RATE_LIMIT_BURST=2)
+class LocalThrottleTests(SimpleTestCase):
+    def setUp(self):
+        throttle._local_bucket = None
+        self.addCleanup(setattr, throttle, "_local_bucket", None)
+
+        self.now = 100.0
+        patcher = mock.patch("subscriptions.throttle.time")
+        self.addCleanup(patcher.stop)
+        patcher.start().monotonic.side_effect = lambda: self.now
+
+    def test_burst_then_wait(self):
+        self.assertEqual(throttle._take_local(), 0)
+        self.assertEqual(throttle._take_local(), 0)
+        self.assertAlmostEqual(throttle._take_local(), 0.1)
+        self.assertAlmostEqual(throttle._take_local(), 0.2)
+
+    def test_refill(self):
+        throttle._take_local()
+        throttle._take_local()
+        self.now += 0.1
+        self.assertAlmostEqual(throttle._take_local(), 0)
+
+    def test_drain_after_rate_limit(self):
+        throttle._take_local()
+        throttle._local_bucket.drain()
+        self.assertAlmostEqual(throttle._take_local(), 0.1)
+
+    @override_settings(STRIPE_RATE_LIMIT_LEASE=3)
+    @mock.patch("subscriptions.throttle.connection")
+    @mock.patch("subscriptions.throttle._reserve", return_value=0.5)
+    def test_leased_tokens_wait_for_their_reservation(self, reserve, connection):
+        connection.in_atomic_block = False
+        self.addCleanup(setattr, throttle, "_leased", 0)
+
+        self.assertEqual(throttle._take(), 0.5)
+        self.now += 0.2
+        self.assertAlmostEqual(throttle._take(), 0.3)
+        self.now += 0.5
+        self.assertEqual(throttle._take(), 0)
+        reserve.assert_called_once()
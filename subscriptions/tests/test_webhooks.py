@@ -0,0 +1,70 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .. import webhooks
+from ..models import ProcessedEvent, WebhookEvent
+
+
+class WebhookTestCase(TestCase):
+    def event(self, event_id="evt_1"):
+        payload = {"id": event_id, "object": "event", "type": "invoice.paid", "created": 0, "data": {"object": {}}}
+        return WebhookEvent.objects.create(event_id=event_id, event_type="invoice.paid", payload=payload)
+
+
+@override_settings(STRIPE_WEBHOOK_RETRY_DELAY=10)
+@mock.patch("subscriptions.webhooks.handle_event", side_effect=RuntimeError("Stripe down"))
+class WebhookRetryTests(WebhookTestCase):
+    def test_failed_event_is_retried_after_its_delay(self, handle_event):
+        event = self.event()
+        webhooks.process_event(event.pk)
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.last_error), ("pending", 1, "Stripe down"))
+        self.assertGreater(event.next_attempt_at, timezone.now() + timedelta(seconds=5))
+        # The dedup entry is rolled back with the failed attempt
+        self.assertFalse(ProcessedEvent.objects.exists())
+
+        self.assertFalse(webhooks.pending_events().exists())
+        self.assertFalse(webhooks.process_event(event.pk))
+
+        WebhookEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(list(webhooks.pending_events()), [event])
+        self.assertTrue(webhooks.process_event(event.pk))
+
+    def test_delay_doubles_on_every_attempt(self, handle_event):
+        event = self.event()
+        WebhookEvent.objects.filter(pk=event.pk).update(attempts=2)
+        webhooks.process_event(event.pk)
+
+        event.refresh_from_db()
+        self.assertGreater(event.next_attempt_at, timezone.now() + timedelta(seconds=35))
+
+    @override_settings(STRIPE_WEBHOOK_MAX_ATTEMPTS=1)
+    def test_event_fails_after_max_attempts(self, handle_event):
+        event = self.event()
+        webhooks.process_event(event.pk)
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.next_attempt_at), ("failed", None))
+        self.assertFalse(webhooks.pending_events().exists())
+
+
+@mock.patch("subscriptions.webhooks.handle_event")
+class WebhookDedupTests(WebhookTestCase):
+    def test_redelivered_event_is_handled_once(self, handle_event):
+        first, second = self.event(), self.event()
+
+        self.assertTrue(webhooks.process_event(first.pk))
+        self.assertTrue(webhooks.process_event(second.pk))
+
+        handle_event.assert_called_once()
+        self.assertEqual(set(WebhookEvent.objects.values_list("status", flat=True)), {"processed"})
+        self.assertIsNone(webhooks.enqueue(first.payload))
+
+    def test_claimed_event_is_not_processed_twice(self, handle_event):
+        event = self.event()
+        webhooks.process_event(event.pk)
+
+        self.assertFalse(webhooks.process_event(event.pk))
+        handle_event.assert_called_once()
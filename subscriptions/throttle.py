@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection
+from .models import StripeRateLimit
+
+logger = logging.getLogger(__name__)
+
+BUCKET_NAME = "stripe-api"
+
+# Reserves `lease` tokens from the shared bucket in one statement. The bucket may go negative: the
+# returned debt tells the caller how long to wait, so concurrent processes queue up instead of polling.
+RESERVE_SQL = f"""
+    INSERT INTO {StripeRateLimit._meta.db_table} (name, tokens, updated_date)
+    VALUES (%(name)s, %(burst)s - %(lease)s, clock_timestamp())
+    ON CONFLICT (name) DO UPDATE SET
+        tokens = LEAST(
+            %(burst)s,
+            {StripeRateLimit._meta.db_table}.tokens
+            + %(rate)s * EXTRACT(EPOCH FROM clock_timestamp() - {StripeRateLimit._meta.db_table}.updated_date)
+        ) - %(lease)s,
+        updated_date = clock_timestamp()
+    RETURNING tokens
+"""
+
+# Per-process throttling counters, exposed by the Stripe client metrics API
+_metrics = {
+    "throttled_requests": 0,
+    "throttled_seconds": 0.0,
+    "rate_limited_responses": 0,
+    "retries": 0,
+    "shared_leases": 0,
+    "local_fallbacks": 0,
+}
+_metrics_lock = threading.Lock()
+
+
+def _add(key, amount=1):
+    with _metrics_lock:
+        _metrics[key] += amount
+
+
+class TokenBucket:
+    """
+    In-process token bucket, used when the shared bucket cannot be reached.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, count=1):
+        """
+        Take `count` tokens and return the seconds to wait before using them.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + self.rate * (now - self.updated)) - count
+        self.updated = now
+        return max(-self.tokens, 0) / self.rate
+
+    def drain(self):
+        self.tokens = min(self.tokens, 0)
+        self.updated = time.monotonic()
+
+
+_lock = threading.Lock()
+_leased = 0
+# When the tokens of the current lease may be used, the reservation may have asked to wait
+_leased_ready_at = 0.0
+_local_bucket = None
+
+
+def acquire():
+    """
+    Block until this process may send one more request to Stripe.
+
+    Tokens are reserved from the shared database bucket STRIPE_RATE_LIMIT_LEASE at a time, so all
+    worker processes together stay under STRIPE_RATE_LIMIT requests per second. Inside a transaction
+    the reservation would keep the bucket row locked until commit, so the in-process bucket is used
+    instead, as it is when the database is unavailable.
+    """
+    with _lock:
+        # Sleeping with the lock held keeps the other threads of the process queued behind this one
+        _sleep(_take())
+
+
+async def aacquire():
+    """
+    Async version of `acquire()`: the token is taken in a worker thread (it may query the shared
+    bucket), the wait happens on the event loop.
+    """
+    await _asleep(await sync_to_async(_take_locked)())
+
+
+def _take_locked():
+    with _lock:
+        return _take()
+
+
+def _take():
+    """
+    Take one token, from the current lease or a new one, and return the seconds to wait before using it.
+    """
+    global _leased, _leased_ready_at
+
+    if _leased > 0:
+        _leased -= 1
+        return max(_leased_ready_at - time.monotonic(), 0)
+
+    if connection.in_atomic_block:
+        return _take_local()
+
+    try:
+        wait = _reserve(settings.STRIPE_RATE_LIMIT_LEASE)
+    except DatabaseError:
+        logger.warning("Shared Stripe rate limit unavailable, throttling locally", exc_info=True)
+        connection.close()
+        return _take_local()
+
+    _leased = settings.STRIPE_RATE_LIMIT_LEASE - 1
+    _leased_ready_at = time.monotonic() + wait
+    return wait
+
+
+def retry_after(attempt, headers):
+    """
+    Wait before retrying a request Stripe answered with 429.
+
+    The process gives back the tokens it still holds, so its next requests queue on the shared bucket
+    again, then sleeps with jittered exponential backoff (or as long as Stripe's Retry-After asks).
+    """
+    _sleep(_retry_delay(attempt, headers))
+
+
+async def aretry_after(attempt, headers):
+    """
+    Async version of `retry_after()`.
+    """
+    await _asleep(_retry_delay(attempt, headers))
+
+
+def _retry_delay(attempt, headers):
+    global _leased
+
+    _add("retries")
+
+    with _lock:
+        _leased = 0
+        if _local_bucket is not None:
+            _local_bucket.drain()
+
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return (2 ** attempt) * 0.5 + random.uniform(0, 0.5)
+
+
+def rate_limited():
+    """
+    Count a request Stripe answered with 429.
+    """
+    _add("rate_limited_responses")
+
+
+def get_metrics():
+    """
+    Return the throttling counters of this process.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+
+    metrics["throttled_seconds"] = round(metrics["throttled_seconds"], 3)
+    return metrics
+
+
+def _reserve(lease):
+    with connection.cursor() as cursor:
+        cursor.execute(RESERVE_SQL, {
+            "name": BUCKET_NAME,
+            "rate": settings.STRIPE_RATE_LIMIT,
+            "burst": settings.STRIPE_RATE_LIMIT_BURST,
+            "lease": lease,
+        })
+        tokens = cursor.fetchone()[0]
+
+    _add("shared_leases")
+    return max(-tokens, 0) / settings.STRIPE_RATE_LIMIT
+
+
+def _take_local():
+    global _local_bucket
+
+    if _local_bucket is None:
+        _local_bucket = TokenBucket(settings.STRIPE_RATE_LIMIT, settings.STRIPE_RATE_LIMIT_BURST)
+
+    _add("local_fallbacks")
+    return _local_bucket.take()
+
+
+def _sleep(seconds):
+    if seconds <= 0:
+        return
+
+    _add("throttled_requests")
+    _add("throttled_seconds", seconds)
+    time.sleep(seconds)
+
+
+async def _asleep(seconds):
+    if seconds <= 0:
+        return
+
+    _add("throttled_requests")
+    _add("throttled_seconds", seconds)
+    await asyncio.sleep(seconds)
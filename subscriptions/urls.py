@@ -1,17 +1,37 @@
 from django.urls import path
 from .views import *
+from .async_views import (
+    AsyncProductRevenueView,
+    AsyncProductsByUserIDView,
+    AsyncStripProductListView,
+    AsyncSubscriptionByUserView,
+)
 
 # Create your urls here
 urlpatterns = [
     path("stripe-success", SuccessTemplateView.as_view(), name="stripe_success"),
     path("stripe-cancel", CancelTemplateView.as_view(), name="stripe_cancel"),
     path("product-list", StripProductListView.as_view(), name="product_list"),
+    path("customer-list", CustomerListView.as_view(), name="customer_list"),
     path("user-subscriptions", SubscriptionByUserView.as_view(), name="user_subscriptions"),
+    path("subscription-export", SubscriptionExportView.as_view(), name="subscription_export"),
     path("user-subscription-information/<int:user_id>", ProductsByUserIDView.as_view(),name="user_subscription_information"),
     path("update-subscription-price", SubscriptionPriceUpdate.as_view(), name="update_subscription_price"),
+    path("price-migration/<int:job_id>", PriceMigrationStatusView.as_view(), name="price_migration_status"),
     path("multi-community-subscription", MultiCommunitySubscriptionAndSave.as_view(), name="multi_community_subscription"),
     path("subscription-cancelation", SubscriptionPlanCancellationView.as_view(), name="subscription_cancelation"),
     path("trial-subscription", FreeTrialSubscription.as_view(), name="trial_subscription"),
     path("revenue-subscription", ProductRevenueView.as_view(), name="revenue_subscription"),
     path("webhook", stripe_webhook, name="webhook"),
+    path("async/product-list", AsyncStripProductListView.as_view(), name="async_product_list"),
+    path("async/user-subscriptions", AsyncSubscriptionByUserView.as_view(), name="async_user_subscriptions"),
+    path("async/user-subscription-information/<int:user_id>", AsyncProductsByUserIDView.as_view(), name="async_user_subscription_information"),
+    path("async/revenue-subscription", AsyncProductRevenueView.as_view(), name="async_revenue_subscription"),
+    path("webhook-stats", WebhookStatsView.as_view(), name="webhook_stats"),
+    path("stripe-client-metrics", StripeClientMetricsView.as_view(), name="stripe_client_metrics"),
+    path("request-metrics", RequestMetricsView.as_view(), name="request_metrics"),
+    path("analytics/mrr", MRRAnalyticsView.as_view(), name="analytics_mrr"),
+    path("analytics/churn", ChurnAnalyticsView.as_view(), name="analytics_churn"),
+    path("analytics/trial-conversion", TrialConversionAnalyticsView.as_view(), name="analytics_trial_conversion"),
+    path("analytics/cohorts", CohortAnalyticsView.as_view(), name="analytics_cohorts"),
 ]
\ No newline at end of file
@@ -1,33 +1,58 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.utils import timezone
 import json
 import uuid
 import stripe
-from rest_framework.response import Response
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework import status, pagination
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
-from subscriptions import utils, constants
-from .models import ClaimCommunityRequest, Users
+from server import constants, utils
+from . import (
+    analytics,
+    breaker,
+    catalog,
+    communities,
+    customers,
+    exports,
+    instrumentation,
+    listings,
+    price_migration,
+    products,
+    projections,
+    stale,
+    stripe_client,
+    tasks,
+    webhooks,
+)
+from .models import PriceMigrationJob, StripeCustomer, Users, WebhookEvent
+from .pagination import decode_stripe_cursor, encode_stripe_cursor, get_paginator, wants_cursor
 from .serializer import *
 from.models import Subscription
 from rest_framework.permissions import IsAuthenticated
 
 
 # Create your views here.
-stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe_client.configure()
 
+# Rows fetched per database round trip by the streaming exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Months returned by the analytics APIs
+ANALYTICS_MONTHS = 12
+ANALYTICS_MAX_MONTHS = 60
+
+# Stripe subscriptions returned per page by the subscription plan API
+SUBSCRIPTION_PLAN_PAGE_SIZE = 10
+SUBSCRIPTION_PLAN_MAX_PAGE_SIZE = 100
 
-class CustomPagination(pagination.PageNumberPagination):
-    """
-    A Custome Pagination for Search Filters
-    """
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
 
 # Template API to show success page
 class SuccessTemplateView(APIView):
@@ -60,50 +85,24 @@ class StripProductListView(APIView):
 
     def get(self, request, *args, **kwargs):
         try:
-            products = stripe.Product.list()
-
-            product_data = []
-
-            for product in products.auto_paging_iter():
-                if product.default_price:
-                    try:
-                        default_price = stripe.Price.retrieve(product.default_price)
-                        product_info = {
-                            "id": product.id,
-                            "name": product.name,
-                            "description": product.description,
-                            "metadata": {
-                                "Type": product.metadata
-                            },
-                            "default_price": {
-                                "id": default_price.id,
-                                "unit_amount": default_price.unit_amount / 100,
-                                "currency": default_price.currency,
-                                "recurring": default_price.recurring,
-                            },
-                        }
-                    except stripe.error.StripeError as e:
-                        return utils.error_response(
-                            message=constants.MESSAGES["STRIPE_ERROR"],
-                            errors=str(e),
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                        )
-                else:
-                    product_info = {
-                        "id": product.id,
-                        "name": product.name,
-                        "description": product.description,
-                        "default_price": None,
-                    }
+            # Served from the local catalog, Stripe is only hit on a cold miss
+            product_data, is_stale = catalog.get_products()
 
-                product_data.append(product_info)
-
-            return utils.success_response(
+            response = utils.success_response(
                 message=constants.MESSAGES["PRODUCT_RETRIVED"],
                 data=product_data,
                 status_code=status.HTTP_200_OK,
                 api_status_code=status.HTTP_200_OK,
             )
+            return stale.mark(response) if is_stale else response
+
+        except breaker.CircuitOpenError as e:
+            return utils.error_response(
+                message=constants.MESSAGES["STRIPE_UNAVAILABLE"],
+                errors=str(e),
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                api_status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
         except stripe.error.StripeError as e:
             return utils.error_response(
@@ -136,7 +135,7 @@ class StripProductListView(APIView):
                 )
 
             try:
-                product = stripe.Product.retrieve(product_id)
+                product, default_price = products.resolve_products([product_id]).get(product_id.strip(), (None, None))
                 if not product:
                     return utils.error_response(
                         message=constants.MESSAGES["PRODUCT_NOT_FOUND"],
@@ -150,16 +149,7 @@ class StripProductListView(APIView):
                     status_code=status.HTTP_400_BAD_REQUEST,
                 )
 
-            if product.default_price:
-                try:
-                    default_price = stripe.Price.retrieve(product.default_price)
-                except stripe.error.StripeError as e:
-                    return utils.error_response(
-                        message=constants.MESSAGES["STRIPE_ERROR"],
-                        errors=str(e),
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                    )
-
+            if default_price:
                 # Payment Session 
                 checkout_session = stripe.checkout.Session.create(
                     payment_method_types=["card"],
@@ -211,16 +201,41 @@ class CustomerListView(APIView):
     permission_classes = [IsAuthenticated]
     
     """
-    API to Retrieve All Available Customer's List from stripe
+    API to Retrieve All Available Customer's List from stripe.
+    Supports streaming exports with ?export=ndjson|csv, from Stripe or the local mirror (?source=local).
     """
 
     def get(self, request, *args, **kwargs):
         try:
-            customers = stripe.Customer.list()
+            export_format = request.GET.get("export")
+
+            if export_format:
+                if export_format not in exports.EXPORT_FORMATS:
+                    return utils.error_response(
+                        message=constants.MESSAGES["INVALID_EXPORT_FORMAT"],
+                        errors=f"Supported formats: {', '.join(exports.EXPORT_FORMATS)}",
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                # Rows are written as each Stripe page (or local chunk) arrives
+                if request.GET.get("source") == "local":
+                    rows = (
+                        {"id": customer.customer_id, "email": customer.email, "name": customer.name}
+                        for customer in StripeCustomer.objects.order_by("id").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+                    )
+                else:
+                    rows = (
+                        {"id": customer.id, "email": customer.email, "name": customer.name}
+                        for customer in stripe.Customer.list(limit=100).auto_paging_iter()
+                    )
+
+                return exports.stream_rows(rows, export_format, ["id", "email", "name"], "customers")
+
+            stripe_customers = stripe.Customer.list()
 
             customer_data = []
 
-            for customer in customers.auto_paging_iter():
+            for customer in stripe_customers.auto_paging_iter():
                 customer_info = {
                     "id": customer.id,
                     "email": customer.email,
@@ -253,58 +268,92 @@ class SubscriptionByUserView(APIView):
 
     def get(self, request):
         try:
-            search_query = request.GET.get("search", "").lower().strip()
+            search_query = request.GET.get("search", "").strip()
 
-            customers = stripe.Customer.list(limit=50)
+            # Served from the local mirror kept up to date by the webhook and `manage.py sync_stripe`
+            items = listings.subscription_items(search_query)
 
-            if not customers.data:
+            # Keyset pagination follows the ("-created", "id") index of the mirror
+            paginator = get_paginator(request, ("-created", "id"))
+            paginated_items = paginator.paginate_queryset(items, request)
+
+            if not paginated_items and not search_query:
                 return utils.error_response(
                     message=constants.MESSAGES["CUSTOMER_NOT_FOUND"],
                     errors=constants.MESSAGES["UNAVAILABLE_CUSTOMERS"],
                     status_code=status.HTTP_404_NOT_FOUND,
                 )
 
-            customer_data = []
+            customer_data = [listings.subscription_item_info(item) for item in paginated_items]
 
-            for customer in customers["data"]:
-                customer_name = customer.get("name", "N/A")
+            return paginator.get_paginated_response(customer_data)
 
-                subscriptions = stripe.Subscription.list(customer=customer["id"], limit=10)
+        except NotFound as e:
+            return utils.error_response(
+                message=constants.MESSAGES["INVALID_PAGE"],
+                errors=str(e.detail),
+                status_code=status.HTTP_404_NOT_FOUND,
+                api_status_code=status.HTTP_404_NOT_FOUND,
+            )
 
-                for sub in subscriptions["data"]:
-                    for item in sub["items"]["data"]:
-                        product = stripe.Product.retrieve(item["plan"]["product"]) 
-                        product_name = product.get("name", "Unknown Product")
+        except Exception as e:
+            return utils.error_response(
+                message=constants.MESSAGES["UNEXPECTED_ERROR"],
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-                        if search_query and search_query not in customer_name.lower() and search_query not in product_name.lower():
-                            continue 
 
-                        customer_data.append({
-                            "customer_name": customer_name,
-                            "product_name": product_name,
-                            "purchased_date": sub["created"],
-                            "amount_paid": item["price"]["unit_amount"] / 100,  
-                            "currency": item["price"]["currency"],
-                        })
+class SubscriptionExportView(APIView):
+    permission_classes = [IsAuthenticated]
 
-            paginator = CustomPagination()
-            paginated_data = paginator.paginate_queryset(customer_data, request)
+    """
+    API to stream every mirrored subscription item as NDJSON (default) or CSV (?export=csv).
+    """
+    fields = [
+        "subscription_id", "customer_id", "customer_name", "customer_email", "product_id", "product_name",
+        "status", "amount", "currency", "quantity", "interval", "created",
+    ]
 
-            return paginator.get_paginated_response(paginated_data)
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("export", "ndjson")
 
-        except Exception as e:
+        if export_format not in exports.EXPORT_FORMATS:
             return utils.error_response(
-                message=constants.MESSAGES["UNEXPECTED_ERROR"],
-                errors=str(e),
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                message=constants.MESSAGES["INVALID_EXPORT_FORMAT"],
+                errors=f"Supported formats: {', '.join(exports.EXPORT_FORMATS)}",
+                status_code=status.HTTP_400_BAD_REQUEST,
             )
 
+        items = listings.subscription_items(request.GET.get("search", "").strip())
+        rows = (
+            {
+                "subscription_id": item.subscription_id,
+                "customer_id": item.customer.customer_id,
+                "customer_name": item.customer.name,
+                "customer_email": item.customer.email,
+                "product_id": item.product_id,
+                "product_name": item.product_name,
+                "status": item.status,
+                "amount": item.unit_amount / 100,
+                "currency": item.currency,
+                "quantity": item.quantity,
+                "interval": item.interval,
+                "created": item.created.isoformat(),
+            }
+            for item in items.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+        return exports.stream_rows(rows, export_format, self.fields, "subscriptions")
+
 
 class SubscriptionPriceUpdate(APIView):
     permission_classes = [IsAuthenticated]
     
     """
     API view to update the price of a subscription for a product.
+
+    The subscriptions are migrated by a background job, poll the returned status_url for its progress.
     """
     def put(self, request, *args, **kwargs):
         product_id = request.data.get("product_id")
@@ -344,30 +393,20 @@ class SubscriptionPriceUpdate(APIView):
                 default_price=new_price_id,
             )
  
-            # Step 3: Update all active subscriptions to use the new price
-            subscriptions = stripe.Subscription.list(limit=100, expand=["data.items"])
- 
-            updated_subscriptions = []
- 
-            for subscription in subscriptions.auto_paging_iter():
-                for item in subscription["items"]["data"]:
-                    if item["price"]["product"] == product.id:
-                        # Update the subscription to use the new price
-                        updated_subscription = stripe.Subscription.modify(
-                            subscription.id,
-                            items=[{
-                                "id": item.id,
-                                "price": new_price_id, 
-                            }],
-                        )
- 
-                        updated_subscriptions.append(updated_subscription.id)
+            # Step 3: Move the existing subscriptions to the new price in the background
+            job = price_migration.start_job(product.id, new_price_id)
+            transaction.on_commit(lambda: tasks.submit_to(tasks.PRICE_MIGRATION_POOL, price_migration.run_job, job.pk))
 
             return utils.success_response(
-                message="Subscription price for the product updated successfully.",
-                data=updated_subscription,
-                status_code=status.HTTP_200_OK,
-                api_status_code=status.HTTP_200_OK,
+                message=constants.MESSAGES["PRICE_MIGRATION_STARTED"],
+                data={
+                    "job_id": job.pk,
+                    "new_price_id": new_price_id,
+                    "status": job.status,
+                    "status_url": reverse("price_migration_status", args=[job.pk]),
+                },
+                status_code=status.HTTP_202_ACCEPTED,
+                api_status_code=status.HTTP_202_ACCEPTED,
             )
  
         except stripe.error.StripeError as e:
@@ -386,69 +425,65 @@ class ProductsByUserIDView(APIView):
 
     def get(self, request, user_id):
         try:
-            # Fetch user from database
-            user = Users.objects.filter(id=user_id).first()
-
-            if not user:
+            # Resolve the Stripe customer linked to the user (cached, searched by email only once)
+            try:
+                customer_id = customers.resolve_customer_id(user_id)
+            except Users.DoesNotExist:
                 return utils.error_response(
                     message=constants.MESSAGES["USER_NOT_FOUND"],
                     errors="User ID does not exist.",
                     status_code=status.HTTP_404_NOT_FOUND,
                 )
 
-            user_email = user.email
-
-            # Search for the customer in Stripe by email
-            customers = stripe.Customer.list(email=user_email).get("data", [])
-
-            if not customers:
+            if not customer_id:
                 return utils.error_response(
                     message=constants.MESSAGES["CUSTOMER_NOT_FOUND"],
                     errors="No customer found with this email in Stripe.",
                     status_code=status.HTTP_404_NOT_FOUND,
                 )
 
-            # Use the first customer found
-            customer_id = customers[0]["id"]
+            def fetch_purchased_products():
+                # Retrieve subscriptions for this customer
+                subscriptions = stripe.Subscription.list(customer=customer_id).get("data", [])
+
+                # Fetch every distinct product of the customer concurrently
+                products_by_id = products.retrieve_products(
+                    item["price"]["product"]
+                    for subscription in subscriptions
+                    for item in subscription["items"]["data"]
+                )
+
+                return [
+                    listings.purchased_product_info(subscription, item, products_by_id[item["price"]["product"]])
+                    for subscription in subscriptions
+                    for item in subscription["items"]["data"]
+                ]
 
-            # Retrieve subscriptions for this customer
-            subscriptions = stripe.Subscription.list(customer=customer_id).get("data", [])
+            # The last good result is served (marked stale) while Stripe is unavailable
+            product_data, is_stale = stale.serve(("purchased_products", customer_id), fetch_purchased_products)
 
-            if not subscriptions:
+            if not product_data:
                 return utils.error_response(
                     message="No active subscriptions found",
                     errors="This customer does not have any active subscriptions.",
                     status_code=status.HTTP_404_NOT_FOUND,
                 )
 
-            product_data = []
-
-            # Loop through each subscription to get product details
-            for subscription in subscriptions:
-                for item in subscription["items"]["data"]:
-                    product_id = item["price"]["product"]
-                    product = stripe.Product.retrieve(product_id)
-
-                    product_info = {
-                        "subscription_id": subscription["id"],
-                        "product_id": product["id"],
-                        "product_name": product.get("name", "N/A"),
-                        "product_description": product.get("description", "N/A"),
-                        "product_type": product.get("type", "N/A"),
-                        "quantity": item.get("quantity", 1),
-                        "price_amount": item["price"]["unit_amount"] / 100,  # Convert to dollars
-                        "currency": item["price"]["currency"].upper(),
-                        "interval": item["price"].get("recurring", {}).get("interval", "none"),
-                    }
-
-                    product_data.append(product_info)
-
-            return utils.success_response(
+            response = utils.success_response(
                 message="Products retrieved successfully",
                 data=product_data,
                 status_code=status.HTTP_200_OK,
                 api_status_code=status.HTTP_200_OK,
             )
+            return stale.mark(response) if is_stale else response
+
+        except breaker.CircuitOpenError as e:
+            return utils.error_response(
+                message=constants.MESSAGES["STRIPE_UNAVAILABLE"],
+                errors=str(e),
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                api_status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
         except stripe.error.InvalidRequestError as e:
             return utils.error_response(
@@ -519,12 +554,9 @@ class MultiCommunitySubscriptionAndSave(APIView):
             )
 
         # Fetch valid community objects
-        communities = ClaimCommunityRequest.objects.filter(
-            claim_for_community_id_id__in=community_uuids,
-            status__in=['accept', 'pending']
-        )
+        claimed_communities = communities.resolve_communities(community_uuids)
 
-        if communities.count() != len(community_uuids):
+        if len(claimed_communities) != len(community_uuids):
             return utils.error_response(
                 message=constants.MESSAGES["SUBSCRIPTION_ERROR"],
                 errors=constants.MESSAGES["SUBSCRIPTION_ERROR"],
@@ -537,37 +569,44 @@ class MultiCommunitySubscriptionAndSave(APIView):
 
             # Calculate total price based on number of communities
             line_items = []
+            try:
+                # One bulk lookup for the whole cart instead of two calls per product
+                resolved_products = products.resolve_products(product_ids)
+            except stripe.error.StripeError as e:
+                return utils.error_response(
+                    message=constants.MESSAGES["STRIPE_API_ERROR"],
+                    errors=str(e),
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
+
             for product_id in product_ids:
                 product_id = product_id.strip()
-                try:
-                    product = stripe.Product.retrieve(product_id)
-                    if product.default_price:
-                        default_price = stripe.Price.retrieve(product.default_price)
-                        price_per_unit = default_price.unit_amount
-                        total_price = price_per_unit * len(communities)
-
-                        line_items.append({
-                            "price_data": {
-                                "currency": "usd",
-                                "product": product.id,
-                                "unit_amount": total_price,
-                                "recurring": {"interval": "month"}
-                            },
-                            "quantity": 1
-                        })
-                    else:
-                        return utils.error_response(
-                            message=constants.MESSAGES["PRICE_FIELD_NOT_FOUND"],
-                            errors=constants.MESSAGES["PRICE_NOT_FOUND"],
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                except stripe.error.StripeError as e:
+                product, default_price = resolved_products.get(product_id, (None, None))
+                if not product:
+                    return utils.error_response(
+                        message=constants.MESSAGES["PRODUCT_NOT_FOUND"],
+                        errors=constants.MESSAGES["PRODUCT_ID_MISSING"],
+                        status_code=status.HTTP_404_NOT_FOUND,
+                    )
 
+                if default_price:
+                    price_per_unit = default_price.unit_amount
+                    total_price = price_per_unit * len(claimed_communities)
+
+                    line_items.append({
+                        "price_data": {
+                            "currency": "usd",
+                            "product": product.id,
+                            "unit_amount": total_price,
+                            "recurring": {"interval": "month"}
+                        },
+                        "quantity": 1
+                    })
+                else:
                     return utils.error_response(
-                        message=constants.MESSAGES["STRIPE_API_ERROR"],
-                        errors=str(e),
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        message=constants.MESSAGES["PRICE_FIELD_NOT_FOUND"],
+                        errors=constants.MESSAGES["PRICE_NOT_FOUND"],
+                        status_code=status.HTTP_400_BAD_REQUEST,
                     )
 
             # Create the Stripe checkout session
@@ -615,89 +654,106 @@ def stripe_webhook(request):
 
     try:
         # Verify webhook signature
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
-        event_type = event["type"]
-        event_data = event["data"]["object"]
-
-        if event_type == "checkout.session.completed":
-            session_id = event_data.get("id")
-            subscription_id = event_data.get("subscription")
-            payment_status = event_data.get("payment_status", "unknown")
-            amount_total = event_data.get("amount_total", 0) / 100 
-            metadata = event_data.get("metadata", {})
-            trial_end_date = event_data.get("trial_end_date") # This is a Unix timestamp
- 
-            # If trial_end is present, convert it to a datetime object
-            if trial_end_date:
-                trial_end_date = datetime.fromtimestamp(trial_end_date)
- 
-            if not metadata:
-                return JsonResponse({"status": "error", "message": "Missing metadata"}, status=400)
-            
-            if not metadata:
-                return JsonResponse({"status": "error", "message": "Missing metadata"}, status=400)
+        stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        return JsonResponse({"status": "error", "message": "Invalid webhook", "details": str(e)}, status=400)
 
-            try:
-                community_ids = json.loads(metadata.get("community_id", "[]"))
-            except json.JSONDecodeError:
-                return JsonResponse({"status": "error", "message": "Invalid community_id format"}, status=400)
+    try:
+        # Persist the event and acknowledge right away, the worker pool does the processing
+        webhooks.enqueue(json.loads(payload))
 
-            user_id = metadata.get("user_id")
+        return JsonResponse({"status": "success"}, status=200)
 
-            try:
-                product_ids = json.loads(metadata.get("product_id", "[]"))
-            except json.JSONDecodeError:
-                return JsonResponse({"status": "error", "message": "Invalid product_id format"}, status=400)
+    except Exception as e:
+        return JsonResponse({"status": "error", "message": "Unexpected error", "details": str(e)}, status=500)
 
 
-            if not community_ids or not user_id:
-                return JsonResponse({"status": "error", "message": "Missing community_id or user_id"}, status=400)
+class WebhookStatsView(APIView):
+    permission_classes = [IsAuthenticated]
 
-            # Validate and fetch community objects
-            try:
-                community_uuid_list = [uuid.UUID(cid) for cid in community_ids]
-            except ValueError:
-                return JsonResponse({"status": "error", "message": "Invalid UUID in community_id"}, status=400)
-
-            communities = ClaimCommunityRequest.objects.filter(claim_for_community_id_id__in=community_uuid_list)
-            user = Users.objects.filter(id=user_id).first()
-
-            if not user:
-                return JsonResponse({"status": "error", "message": "User not found"}, status=400)
-
-            if communities.count() != len(community_uuid_list):
-                return JsonResponse({"status": "error", "message": "One or more communities not found"}, status=400)
-
-            # Store or update subscription details for each community
-            if subscription_id:
-                for community in communities:
-                    community_info_instance = CommunityInformation.objects.filter(
-                        id=community.claim_for_community_id_id
-                    ).first()
-
-                    if not community_info_instance:
-                        continue
-
-                    for product_id in product_ids:
-                        subscription, created = Subscription.objects.update_or_create(
-                            stripe_subscription_id=subscription_id,
-                            community=community_info_instance,
-                            user=user,
-                            product_id=product_id.strip(),
-                            defaults={
-                                "payment_status": payment_status,
-                                "payment_amount": amount_total / len(communities),
-                                "trial_end_date" : trial_end_date
-                            }
-                        )
+    """
+    API to inspect the webhook inbox and how many redelivered events the dedup index dropped.
+    """
+    def get(self, request, *args, **kwargs):
+        inbox = dict(
+            WebhookEvent.objects.values_list("status").annotate(total=Count("id")).order_by()
+        )
 
-            return JsonResponse({"status": "success"}, status=200)
+        return utils.success_response(
+            message=constants.MESSAGES["WEBHOOK_STATS_FETCHED"],
+            data={
+                "dedup": webhooks.dedup_stats(),
+                "inbox": inbox,
+            },
+            status_code=status.HTTP_200_OK,
+            api_status_code=status.HTTP_200_OK,
+        )
 
 
-        return JsonResponse({"status": "success"}, status=200)
+class StripeClientMetricsView(APIView):
+    permission_classes = [IsAuthenticated]
 
-    except Exception as e:
-        return JsonResponse({"status": "error", "message": "Unexpected error", "details": str(e)}, status=500)
+    """
+    API to inspect how well this process reuses its pooled Stripe connections.
+    """
+    def get(self, request, *args, **kwargs):
+        return utils.success_response(
+            message=constants.MESSAGES["STRIPE_METRICS_FETCHED"],
+            data=dict(stripe_client.get_metrics(), stale=stale.get_metrics()),
+            status_code=status.HTTP_200_OK,
+            api_status_code=status.HTTP_200_OK,
+        )
+
+
+class RequestMetricsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    """
+    API to inspect the average Stripe calls, SQL queries and latency of each route in this process.
+    """
+    def get(self, request, *args, **kwargs):
+        return utils.success_response(
+            message=constants.MESSAGES["REQUEST_METRICS_FETCHED"],
+            data=instrumentation.get_metrics(),
+            status_code=status.HTTP_200_OK,
+            api_status_code=status.HTTP_200_OK,
+        )
+
+
+class PriceMigrationStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    """
+    API to follow the progress of a background subscription price migration.
+    """
+    def get(self, request, job_id, *args, **kwargs):
+        job = PriceMigrationJob.objects.filter(pk=job_id).first()
+
+        if not job:
+            return utils.error_response(
+                message=constants.MESSAGES["PRICE_MIGRATION_NOT_FOUND"],
+                errors="Price migration job does not exist.",
+                status_code=status.HTTP_404_NOT_FOUND,
+                api_status_code=status.HTTP_404_NOT_FOUND,
+            )
+
+        return utils.success_response(
+            message=constants.MESSAGES["PRICE_MIGRATION_FETCHED"],
+            data={
+                "job_id": job.pk,
+                "product_id": job.product_id,
+                "new_price_id": job.new_price_id,
+                "status": job.status,
+                "processed_count": job.processed_count,
+                "updated_count": job.updated_count,
+                "failed_subscription_ids": job.failed_subscription_ids,
+                "last_error": job.last_error,
+                "started_date": job.started_date,
+                "finished_date": job.finished_date,
+            },
+            status_code=status.HTTP_200_OK,
+            api_status_code=status.HTTP_200_OK,
+        )
 
 
 class SubscriptionPlanCancellationView(APIView):
@@ -705,90 +761,73 @@ class SubscriptionPlanCancellationView(APIView):
     
     """
     GET METHOD FOR SUBSCRIPTION Plan Fetching
+
+    Query parameters:
+    - fields: Comma separated fields to return, e.g. "id,status,items.data.price.unit_amount" (all by default).
+    - page_size: Page size, up to 100 (10 by default).
+    - pagination: "cursor" returns {results, has_more, next} instead of the bare list of subscriptions.
+    - cursor: Opaque cursor of the next page, as returned in `next`.
     """
     def get(self, request, *args, **kwargs):
-        stripe_subscription_plan = stripe.Subscription.list(limit=10)
-        
-        filtered_data = [
-            {
-                "id": sub["id"],
-                "object": sub["object"],
-                "billing_cycle_anchor": sub["billing_cycle_anchor"],
-                "cancel_at_period_end": sub["cancel_at_period_end"],
-                "collection_method": sub["collection_method"],
-                "created": sub["created"],
-                "currency": sub["currency"],
-                "current_period_end": sub["current_period_end"],
-                "current_period_start": sub["current_period_start"],
-                "customer": sub["customer"],
-                "default_payment_method": sub.get("default_payment_method"),
-                "items": {
-                    "object": sub["items"]["object"],
-                    "data": [
-                        {
-                            "id": item["id"],
-                            "object": item["object"],
-                            "created": item["created"],
-                            "plan": {
-                                "id": item["plan"]["id"],
-                                "object": item["plan"]["object"],
-                                "active": item["plan"]["active"],
-                                "billing_scheme": item["plan"]["billing_scheme"],
-                                "created": item["plan"]["created"],
-                                "currency": item["plan"]["currency"],
-                                "interval": item["plan"]["interval"],
-                                "interval_count": item["plan"]["interval_count"],
-                                "livemode": item["plan"]["livemode"],
-                                "product": item["plan"]["product"],
-                                "usage_type": item["plan"]["usage_type"],
-                            },
-                            "price": {
-                                "id": item["price"]["id"],
-                                "object": item["price"]["object"],
-                                "active": item["price"]["active"],
-                                "billing_scheme": item["price"]["billing_scheme"],
-                                "created": item["price"]["created"],
-                                "currency": item["price"]["currency"],
-                                "livemode": item["price"]["livemode"],
-                                "product": item["price"]["product"],
-                                "recurring": item["price"]["recurring"],
-                                "tax_behavior": item["price"].get("tax_behavior"),
-                                "type": item["price"]["type"],
-                                "unit_amount": item["price"]["unit_amount"],
-                                "unit_amount_decimal": item["price"]["unit_amount_decimal"],
-                            },
-                            "quantity": item["quantity"],
-                            "subscription": item["subscription"],
-                        }
-                        for item in sub["items"]["data"]
-                    ],
-                    "total_count": sub["items"]["total_count"],
-                    "url": sub["items"]["url"],
-                },
-                "plan": {
-                    "id": sub["plan"]["id"],
-                    "object": sub["plan"]["object"],
-                    "active": sub["plan"]["active"],
-                    "billing_scheme": sub["plan"]["billing_scheme"],
-                    "created": sub["plan"]["created"],
-                    "currency": sub["plan"]["currency"],
-                    "interval": sub["plan"]["interval"],
-                    "interval_count": sub["plan"]["interval_count"],
-                    "livemode": sub["plan"]["livemode"],
-                    "product": sub["plan"]["product"],
-                    "usage_type": sub["plan"]["usage_type"],
-                },
-                "quantity": sub["quantity"],
-                "start_date": sub["start_date"],
-                "status": sub["status"],
-                "trial_settings": sub["trial_settings"],
-            }
-            for sub in stripe_subscription_plan["data"]
-        ]
+        try:
+            selection = listings.SUBSCRIPTION_PLAN_PROJECTION.select(request.GET.get("fields"))
+        except projections.ProjectionError as e:
+            return utils.error_response(
+                message=constants.MESSAGES["INVALID_FIELDS"],
+                errors=f"Unknown fields: {e}",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limit = min(int(request.GET.get("page_size", SUBSCRIPTION_PLAN_PAGE_SIZE)), SUBSCRIPTION_PLAN_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return utils.error_response(
+                message=constants.MESSAGES["INVALID_FORMAT"],
+                errors=f"page_size must be a number between 1 and {SUBSCRIPTION_PLAN_MAX_PAGE_SIZE}",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        params = {"limit": limit}
+        if request.GET.get("cursor"):
+            try:
+                params["starting_after"] = decode_stripe_cursor(request.GET["cursor"])
+            except ValueError as e:
+                return utils.error_response(
+                    message=constants.MESSAGES["INVALID_CURSOR"],
+                    errors=str(e),
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            stripe_subscription_plan = stripe.Subscription.list(**params)
+        except stripe.error.InvalidRequestError as e:
+            return utils.error_response(
+                message=constants.MESSAGES["STRIPE_ERROR"],
+                errors=str(e),
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        except stripe.error.StripeError as e:
+            return utils.error_response(
+                message=constants.MESSAGES["STRIPE_API_ERROR"],
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        subscriptions = stripe_subscription_plan.data
+        data = selection.project_many(subscriptions)
+
+        # Same response as before cursor pagination unless the client asks for it
+        if wants_cursor(request):
+            next_url = None
+            if stripe_subscription_plan.has_more and subscriptions:
+                next_url = replace_query_param(request.build_absolute_uri(), "cursor", encode_stripe_cursor(subscriptions[-1]["id"]))
+            data = {"results": data, "has_more": stripe_subscription_plan.has_more, "next": next_url}
 
         return utils.success_response(
             message=constants.MESSAGES["SUBSCRIPTION_PLAN_FETCHED"],
-            data=filtered_data,
+            data=data,
             status_code=status.HTTP_200_OK,
             api_status_code=status.HTTP_200_OK,
         )
@@ -808,33 +847,27 @@ class SubscriptionPlanCancellationView(APIView):
                 status_code=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Fetch user email from User table
-        user = Users.objects.filter(id=user_id).first()
-
-        if not user:
-            return utils.error_response(
-                message=constants.MESSAGES["USER_NOT_FOUND"],
-                errors="User id does not exists",
-                status_code=status.HTTP_404_NOT_FOUND,
-            )
-
-        user_email = user.email 
-            
         try:
-            customers = stripe.Customer.list(email=user_email).get("data", [])
+            # Resolve the Stripe customer linked to the user (cached, searched by email only once)
+            try:
+                customer_id = customers.resolve_customer_id(user_id)
+            except Users.DoesNotExist:
+                return utils.error_response(
+                    message=constants.MESSAGES["USER_NOT_FOUND"],
+                    errors="User id does not exists",
+                    status_code=status.HTTP_404_NOT_FOUND,
+                )
             
-            if not customers:
+            if not customer_id:
                 return utils.error_response(
                     message=constants.MESSAGES["CUSTOMER_NOT_FOUND"],
                     errors="Customer not found",
                     status_code=status.HTTP_404_NOT_FOUND,
                 )
             
-            customer = customers[0]
-            
             subscription = stripe.Subscription.retrieve(subscription_id)
 
-            if subscription["customer"] != customer["id"]:
+            if subscription["customer"] != customer_id:
                 return utils.error_response(
                     message=constants.MESSAGES["INVALID_SUBSCRIPTION_ID"],
                     errors="Subscription does not belong to this user",
@@ -907,18 +940,12 @@ class FreeTrialSubscription(APIView):
                 status_code=status.HTTP_400_BAD_REQUEST,
             )
             
-        # Fetch valid ClaimCommunityRequest objects with accepted or pending status
-        claim_requests = ClaimCommunityRequest.objects.filter(
-            claim_for_community_id_id__in=community_uuids,
-            status__in=['accept', 'pending']  # Only accept or pending status
-        )
- 
-        # Check if all the community_ids have valid claim requests with accepted or pending status
-        valid_community_uuids = list(claim_requests.values_list('claim_for_community_id_id', flat=True))
+        # Fetch the communities with an accepted or pending claim request
+        valid_community_uuids = list(communities.resolve_communities(community_uuids))
  
         # If the number of valid communities doesn't match the input, return an error
         if len(valid_community_uuids) != len(community_uuids):
-            invalid_communities = set(community_uuids) - set(valid_community_uuids)
+            invalid_communities = set(community_uuids) - {str(community_uuid) for community_uuid in valid_community_uuids}
             return utils.error_response(
                 message=constants.MESSAGES["INVALID_COMMUNITY_STATUS"],
                 errors=f"Communities with IDs {invalid_communities} are not in a valid state (accepted or pending).",
@@ -947,45 +974,54 @@ class FreeTrialSubscription(APIView):
  
             # Check if all the products have a default price of 0 (for free trial)
             line_items = []
+            try:
+                # One bulk lookup for the whole cart instead of two calls per product
+                resolved_products = products.resolve_products(product_ids)
+            except stripe.error.StripeError as e:
+                return utils.error_response(
+                    message=constants.MESSAGES["STRIPE_API_ERROR"],
+                    errors=str(e),
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
+
             for product_id in product_ids:
                 product_id = product_id.strip()
-                try:
-                    product = stripe.Product.retrieve(product_id)
-                    if product.default_price:
-                        default_price = stripe.Price.retrieve(product.default_price)
-                        price_per_unit = default_price.unit_amount
+                product, default_price = resolved_products.get(product_id, (None, None))
+                if not product:
+                    return utils.error_response(
+                        message=constants.MESSAGES["PRODUCT_NOT_FOUND"],
+                        errors=constants.MESSAGES["PRODUCT_ID_MISSING"],
+                        status_code=status.HTTP_404_NOT_FOUND,
+                    )
+
+                if default_price:
+                    price_per_unit = default_price.unit_amount
  
-                        # Ensure the price is zero for a free trial
-                        if price_per_unit != 0:
-                            return utils.error_response(
-                                message=constants.MESSAGES["THIS_PRODUCT_IS_NOT_FREE"],
-                                errors="Ensure you are using a free trial product.",
-                                status_code=status.HTTP_400_BAD_REQUEST,
-                            )
-                            
-                        # Add line item for the subscription
-                        line_items.append({
-                            "price_data": {
-                                "currency": "usd",
-                                "product": product.id,
-                                "unit_amount": price_per_unit,  
-                                "recurring": {"interval": "month"}
-                            },
-                            "quantity": 1
-                        })
-                    else:
+                    # Ensure the price is zero for a free trial
+                    if price_per_unit != 0:
                         return utils.error_response(
                             message=constants.MESSAGES["THIS_PRODUCT_IS_NOT_FREE"],
                             errors="Ensure you are using a free trial product.",
                             status_code=status.HTTP_400_BAD_REQUEST,
                         )
- 
-                except stripe.error.StripeError as e:
+                        
+                    # Add line item for the subscription
+                    line_items.append({
+                        "price_data": {
+                            "currency": "usd",
+                            "product": product.id,
+                            "unit_amount": price_per_unit,  
+                            "recurring": {"interval": "month"}
+                        },
+                        "quantity": 1
+                    })
+                else:
                     return utils.error_response(
-                        message=constants.MESSAGES["STRIPE_API_ERROR"],
-                        errors=str(e),
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        message=constants.MESSAGES["THIS_PRODUCT_IS_NOT_FREE"],
+                        errors="Ensure you are using a free trial product.",
+                        status_code=status.HTTP_400_BAD_REQUEST,
                     )
+ 
                     
             trial_end_date = timezone.now() + timedelta(days=30)
             # Create the Stripe subscription session with free trial
@@ -1028,67 +1064,28 @@ class ProductRevenueView(APIView):
 
     def get(self, request):
         try:
-            # Get search query parameters (if provided)
-            search_state = request.GET.get("Search_State", "").lower().strip()
-            search_service = request.GET.get("Search_Service", "").lower().strip()
-            search_product = request.GET.get("Search_Product", "").lower().strip()
-            search_month = request.GET.get("Search_Month", "").lower().strip()
-            search_year = request.GET.get("Search_Year", "").lower().strip()
-
-            product_revenue = {}
-
-            # Fetch all subscriptions (limit to avoid overload)
-            subscriptions = stripe.Subscription.list(limit=100)
-
-            for sub in subscriptions["data"]:
-                for item in sub["items"]["data"]:
-                    price = item["price"]
-                    product_id = price["product"]
-
-                    # Fetch product details
-                    product = stripe.Product.retrieve(product_id)
-                    product_name = product.get("name", "Unknown Product")
-                    currency = price["currency"]
-                    purchased_date = sub["created"]  # UNIX timestamp
-
-                    # Convert date to readable format for filtering
-                    from datetime import datetime
-
-                    purchase_date = datetime.utcfromtimestamp(purchased_date)
-                    purchase_month = str(purchase_date.month)
-                    purchase_year = str(purchase_date.year)
-
-                    total_price = (price["unit_amount"] / 100) * item["quantity"]
-
-                    # Apply search filters
-                    if (
-                        (not search_product or search_product in product_name.lower()) and
-                        (not search_month or search_month == purchase_month) and
-                        (not search_year or search_year == purchase_year)
-                    ):
-                        if product_id in product_revenue:
-                            product_revenue[product_id]["total_revenue"] += total_price
-                        else:
-                            product_revenue[product_id] = {
-                                "product_name": product_name,
-                                "total_revenue": total_price,
-                                "currency": currency,
-                            }
-
-            # Convert dictionary to list format
-            revenue_data = list(product_revenue.values())
-
-            # Apply Pagination
-            paginator = CustomPagination()
-            paginated_data = paginator.paginate_queryset(revenue_data, request)
+            # Single GROUP BY over the pre-aggregated rollup instead of scanning Stripe
+            product_revenue = listings.product_revenue(request.GET)
+
+            # Apply Pagination, keyset pagination follows the product_id leading the rollup's unique index
+            paginator = get_paginator(request, ("product_id", "currency"))
+            paginated_data = paginator.paginate_queryset(product_revenue, request)
             # success response data
             return paginator.get_paginated_response(
                 {
                     "message": constants.MESSAGES["REVENUE_CALCULATED"],
-                    "data": paginated_data,
+                    "data": [listings.product_revenue_info(row) for row in paginated_data],
                 }
             )
 
+        except NotFound as e:
+            return utils.error_response(
+                message=constants.MESSAGES["INVALID_PAGE"],
+                errors=str(e.detail),
+                status_code=status.HTTP_404_NOT_FOUND,
+                api_status_code=status.HTTP_404_NOT_FOUND,
+            )
+
         except Exception as e:
             return utils.error_response(
                 message=constants.MESSAGES["UNEXPECTED_ERROR"],
@@ -1096,4 +1093,71 @@ class ProductRevenueView(APIView):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
             
-            
\ No newline at end of file
+            
+
+
+class AnalyticsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    """
+    Base API for the subscription analytics, computed from the local subscription mirror.
+
+    Query parameters:
+    - months: Number of months (or cohorts) to return, up to 60 (12 by default).
+    """
+    compute = None
+
+    def get(self, request, *args, **kwargs):
+        try:
+            months = int(request.GET.get("months", ANALYTICS_MONTHS))
+        except ValueError:
+            months = 0
+        if not 1 <= months <= ANALYTICS_MAX_MONTHS:
+            return utils.error_response(
+                message=constants.MESSAGES["INVALID_FORMAT"],
+                errors=f"months must be a number between 1 and {ANALYTICS_MAX_MONTHS}",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            return utils.success_response(
+                message=constants.MESSAGES["ANALYTICS_FETCHED"],
+                data=self.compute(months),
+                status_code=status.HTTP_200_OK,
+                api_status_code=status.HTTP_200_OK,
+            )
+
+        except Exception as e:
+            return utils.error_response(
+                message=constants.MESSAGES["UNEXPECTED_ERROR"],
+                errors=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class MRRAnalyticsView(AnalyticsView):
+    """
+    API to get the monthly recurring revenue per currency, by product and month.
+    """
+    compute = staticmethod(analytics.mrr)
+
+
+class ChurnAnalyticsView(AnalyticsView):
+    """
+    API to get the monthly subscription churn.
+    """
+    compute = staticmethod(analytics.churn)
+
+
+class TrialConversionAnalyticsView(AnalyticsView):
+    """
+    API to get the monthly free trial conversion.
+    """
+    compute = staticmethod(analytics.trial_conversion)
+
+
+class CohortAnalyticsView(AnalyticsView):
+    """
+    API to get the monthly customer retention cohorts.
+    """
+    compute = staticmethod(analytics.cohorts)
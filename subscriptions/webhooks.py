@@ -0,0 +1,279 @@
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+import uuid
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from . import catalog, communities, customers, sync, tasks
+from .models import ProcessedEvent, Subscription, Users, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Natural key of a local Subscription row, see the unique_subscription_community_product constraint
+SUBSCRIPTION_UNIQUE_FIELDS = ["stripe_subscription_id", "community", "user", "product_id"]
+
+
+class WebhookEventError(Exception):
+    """
+    Raised for events that can never be processed (bad metadata, unknown user...), so they are not retried.
+    """
+
+
+# Per-process counters of the processed-events index, exposed by the webhook stats API
+_dedup_stats = {"hits": 0, "misses": 0}
+_dedup_lock = threading.Lock()
+
+
+def dedup_stats():
+    """
+    Return how many deliveries were dropped as duplicates (hits) or handled (misses) by this process.
+    """
+    with _dedup_lock:
+        return dict(_dedup_stats)
+
+
+def _count(key):
+    with _dedup_lock:
+        _dedup_stats[key] += 1
+
+
+def enqueue(payload):
+    """
+    Persist a verified Stripe event to the inbox and schedule it on the worker pool.
+
+    Args:
+    - payload (dict): The decoded event body as sent by Stripe.
+
+    Returns:
+    - WebhookEvent: The stored inbox row, or None when the event was already processed.
+    """
+    if ProcessedEvent.objects.filter(event_id=payload["id"]).exists():
+        _count("hits")
+        return None
+
+    event = WebhookEvent.objects.create(
+        event_id=payload["id"],
+        event_type=payload["type"],
+        payload=payload,
+    )
+    transaction.on_commit(lambda: tasks.submit(process_event, event.id))
+
+    return event
+
+
+def process_event(event_pk):
+    """
+    Claim an inbox row and run its handler.
+
+    Rows are claimed with a lease (STRIPE_WEBHOOK_LEASE). A failed attempt puts the row back in the
+    pending status, due again after STRIPE_WEBHOOK_RETRY_DELAY seconds, doubled on every attempt, up
+    to STRIPE_WEBHOOK_MAX_ATTEMPTS. Retries and events left behind by a process that stopped (crash,
+    deploy) are picked up by `manage.py process_webhooks --loop`. Delivery is at-least-once: handlers
+    must be idempotent.
+
+    Returns:
+    - bool: True when the event was claimed by this call, False when it is not due (or already claimed).
+    """
+    now = timezone.now()
+    claimed = WebhookEvent.objects.filter(_due(now), pk=event_pk).update(
+        status="processing",
+        attempts=F("attempts") + 1,
+        locked_until=now + timedelta(seconds=settings.STRIPE_WEBHOOK_LEASE),
+    )
+    if not claimed:
+        return False
+
+    event = WebhookEvent.objects.get(pk=event_pk)
+    try:
+        with transaction.atomic():
+            # Recorded in the same transaction as the handler, so a failed attempt can be retried
+            if _mark_processed(event):
+                handle_event(stripe.Event.construct_from(event.payload, stripe.api_key))
+
+    except WebhookEventError as e:
+        event.status, event.last_error = "failed", str(e)
+
+    except Exception as e:
+        event.status = "pending" if event.attempts < settings.STRIPE_WEBHOOK_MAX_ATTEMPTS else "failed"
+        event.last_error = str(e)
+        logger.warning("Webhook event %s failed (attempt %s): %s", event.event_id, event.attempts, e)
+
+    else:
+        event.status, event.last_error, event.processed_date = "processed", None, timezone.now()
+
+    event.locked_until = None
+    event.next_attempt_at = _retry_at(event) if event.status == "pending" else None
+    event.save(update_fields=["status", "last_error", "processed_date", "locked_until", "next_attempt_at"])
+
+    return True
+
+
+def _retry_at(event):
+    """
+    Return when a failed event is due again: STRIPE_WEBHOOK_RETRY_DELAY seconds, doubled on every attempt.
+    """
+    delay = settings.STRIPE_WEBHOOK_RETRY_DELAY * 2 ** (event.attempts - 1)
+    return timezone.now() + timedelta(seconds=delay)
+
+
+def _due(now):
+    """
+    Return the filter of inbox rows a worker may claim: pending rows whose retry delay has passed and
+    rows whose lease has expired.
+    """
+    return (
+        Q(status="pending", next_attempt_at__isnull=True)
+        | Q(status="pending", next_attempt_at__lte=now)
+        | Q(status="processing", locked_until__lt=now)
+    )
+
+
+def prune_processed_events():
+    """
+    Delete dedup entries and processed inbox rows older than STRIPE_WEBHOOK_DEDUP_RETENTION days.
+
+    Returns:
+    - tuple: Number of (dedup entries, inbox rows) deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.STRIPE_WEBHOOK_DEDUP_RETENTION)
+
+    deleted_events, _ = ProcessedEvent.objects.filter(processed_date__lt=cutoff).delete()
+    deleted_inbox, _ = WebhookEvent.objects.filter(status="processed", processed_date__lt=cutoff).delete()
+
+    return deleted_events, deleted_inbox
+
+
+def _mark_processed(event):
+    """
+    Record the event in the processed-events index.
+
+    Returns:
+    - bool: False when another delivery of the same event was already handled.
+    """
+    try:
+        with transaction.atomic():
+            ProcessedEvent.objects.create(event_id=event.event_id, event_type=event.event_type)
+    except IntegrityError:
+        _count("hits")
+        return False
+
+    _count("misses")
+    return True
+
+
+def pending_events():
+    """
+    Return inbox rows that are due for a worker, including those whose lease has expired.
+    """
+    return WebhookEvent.objects.filter(_due(timezone.now())).order_by("received_date")
+
+
+def handle_event(event):
+    """
+    Dispatch a Stripe event to its handler.
+    """
+    event_type = event["type"]
+    event_data = event["data"]["object"]
+
+    if event_type == "checkout.session.completed":
+        handle_checkout_session_completed(event_data)
+
+    # Keep the local product/price catalog and the customer/subscription mirror in sync
+    elif event_type in catalog.PRODUCT_EVENTS:
+        catalog.handle_product_event(event_type, event_data)
+        sync.handle_product_event(event_type, event_data)
+
+    elif event_type in catalog.PRICE_EVENTS:
+        catalog.handle_price_event(event_type, event_data)
+
+    elif event_type in sync.CUSTOMER_EVENTS:
+        sync.handle_customer_event(event_type, event_data, event.get("created"))
+
+    elif event_type in sync.SUBSCRIPTION_EVENTS:
+        sync.handle_subscription_event(event_type, event_data, event.get("created"))
+
+
+def handle_checkout_session_completed(event_data):
+    """
+    Store or update the local Subscription rows of a completed checkout session.
+    """
+    subscription_id = event_data.get("subscription")
+    payment_status = event_data.get("payment_status", "unknown")
+    amount_total = event_data.get("amount_total", 0) / 100
+    metadata = event_data.get("metadata", {})
+    trial_end_date = event_data.get("trial_end_date") # This is a Unix timestamp
+
+    # If trial_end is present, convert it to a datetime object
+    if trial_end_date:
+        trial_end_date = datetime.fromtimestamp(trial_end_date)
+
+    if not metadata:
+        raise WebhookEventError("Missing metadata")
+
+    try:
+        community_ids = json.loads(metadata.get("community_id", "[]"))
+    except json.JSONDecodeError:
+        raise WebhookEventError("Invalid community_id format")
+
+    user_id = metadata.get("user_id")
+
+    try:
+        product_ids = json.loads(metadata.get("product_id", "[]"))
+    except json.JSONDecodeError:
+        raise WebhookEventError("Invalid product_id format")
+
+    if not community_ids or not user_id:
+        raise WebhookEventError("Missing community_id or user_id")
+
+    # Validate and fetch community objects
+    try:
+        community_uuid_list = [uuid.UUID(cid) for cid in community_ids]
+    except ValueError:
+        raise WebhookEventError("Invalid UUID in community_id")
+
+    # Any claim status: the checkout views already validated it when the session was created
+    claimed_communities = communities.resolve_communities(community_uuid_list, statuses=None)
+    user = Users.objects.filter(id=user_id).first()
+
+    if not user:
+        raise WebhookEventError("User not found")
+
+    if len(claimed_communities) != len(community_uuid_list):
+        raise WebhookEventError("One or more communities not found")
+
+    customers.link(user.id, event_data.get("customer"))
+
+    # Store or update subscription details for each community, as one bulk upsert
+    if subscription_id:
+        product_ids = list(dict.fromkeys(product_id.strip() for product_id in product_ids))
+
+        # The checkout event may be processed after the subscription was canceled, keep it canceled
+        with transaction.atomic():
+            sync.lock_subscriptions([subscription_id])
+            if sync.is_canceled(subscription_id):
+                payment_status = "canceled"
+
+            rows = [
+                Subscription(
+                    stripe_subscription_id=subscription_id,
+                    community=community_info_instance,
+                    user=user,
+                    product_id=product_id,
+                    payment_status=payment_status,
+                    payment_amount=amount_total / len(community_uuid_list),
+                    trial_end_date=trial_end_date,
+                )
+                for community_info_instance in claimed_communities.values()
+                for product_id in product_ids
+            ]
+
+            Subscription.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=SUBSCRIPTION_UNIQUE_FIELDS,
+                update_fields=["payment_status", "payment_amount", "trial_end_date", "modified_date"],
+            )